@@ -1,92 +1,340 @@
 """
 Caching module for contract analysis results.
-Provides in-memory caching to avoid re-analyzing identical obligations.
+Two tiers avoid re-analyzing identical obligations: an in-memory L1 per
+worker and a compressed SQLite L2 shared by all workers on the host and
+kept across restarts.
 """
 import hashlib
 import json
-from functools import lru_cache
-from typing import Dict, Optional, Any
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# SQLite file for the L2 tier; empty keeps the cache in memory only
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join("user_memory", "analysis_cache.sqlite"))
+# Memory budget of the in-memory (L1) tier, and default entry lifetime in seconds (0 = none)
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "86400"))
+# Size cap of the SQLite (L2) tier in compressed bytes; oldest rows are pruned first
+ANALYSIS_CACHE_DISK_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+# Writes between two prune passes (a pass scans the table)
+_PRUNE_EVERY = 100
+
+
+class DiskCache:
+    """L2 tier: zlib-compressed JSON results in SQLite."""
+    
+    def __init__(
+        self,
+        path: str = ANALYSIS_CACHE_PATH,
+        ttl: float = ANALYSIS_CACHE_TTL,
+        max_bytes: int = ANALYSIS_CACHE_DISK_MAX_BYTES
+    ):
+        """
+        Initialize disk tier (the database is opened on first use).
+        
+        Args:
+            path: SQLite database file
+            ttl: Lifetime given to rows written before expiry was tracked
+            max_bytes: Compressed size the table is pruned back to (0 = no cap)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._pruned = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._hits = 0
+        self._misses = 0
+        self._expirations = 0
+    
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL, "
+                "expires_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(analysis_cache)")]
+            if "expires_at" not in columns:
+                # Table from before expiry was stored: old rows get the default lifetime
+                self._conn.execute("ALTER TABLE analysis_cache ADD COLUMN expires_at REAL NOT NULL DEFAULT 0")
+                if self.ttl:
+                    self._conn.execute("UPDATE analysis_cache SET expires_at = created_at + ?", (self.ttl,))
+            self._conn.commit()
+            self._prune(self._conn)
+        return self._conn
+    
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Delete expired rows, then the oldest rows until under max_bytes."""
+        pruned = conn.execute(
+            "DELETE FROM analysis_cache WHERE expires_at > 0 AND expires_at <= ?", (time.time(),)
+        ).rowcount
+        if self.max_bytes:
+            total = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM analysis_cache").fetchone()[0]
+            if total > self.max_bytes:
+                # Free a little extra so the next writes do not trigger another pass
+                excess = total - int(self.max_bytes * 0.9)
+                doomed = []
+                for key, nbytes in conn.execute("SELECT key, LENGTH(value) FROM analysis_cache ORDER BY created_at"):
+                    if excess <= 0:
+                        break
+                    doomed.append((key,))
+                    excess -= nbytes
+                conn.executemany("DELETE FROM analysis_cache WHERE key = ?", doomed)
+                pruned += len(doomed)
+        conn.commit()
+        if pruned:
+            self._pruned += pruned
+            logger.info(f"Pruned {pruned} rows from the analysis cache L2 tier")
+    
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Look up a result.
+        
+        Returns:
+            Tuple of (result, remaining lifetime in seconds, 0 = no expiry),
+            or None if missing or expired (expired rows are deleted)
+        """
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT value, expires_at FROM analysis_cache WHERE key = ?", (key,)
+                ).fetchone()
+                remaining = 0.0
+                if row is not None and row[1]:
+                    remaining = row[1] - time.time()
+                    if remaining <= 0:
+                        conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                        conn.commit()
+                        self._expirations += 1
+                        row = None
+                if row is None:
+                    self._misses += 1
+                    return None
+                self._hits += 1
+            return json.loads(zlib.decompress(row[0]).decode("utf-8")), remaining
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            logger.warning(f"Analysis cache L2 lookup failed: {e}")
+            return None
+    
+    def set(self, key: str, result: Dict[str, Any], ttl: float = 0) -> None:
+        """Store a result; ttl is its lifetime in seconds (0 = no expiry)."""
+        value = zlib.compress(json.dumps(result).encode("utf-8"))
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now + ttl if ttl else 0),
+                )
+                conn.commit()
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store analysis in L2 cache: {e}")
+    
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM analysis_cache")
+            conn.commit()
+            self._hits = 0
+            self._misses = 0
+            self._expirations = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get disk tier statistics.
+        
+        Returns:
+            Dictionary with size (entries and compressed bytes) and hit stats
+        """
+        try:
+            with self._lock:
+                size, nbytes = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM analysis_cache"
+                ).fetchone()
+        except sqlite3.Error:
+            size, nbytes = 0, 0
+        total_requests = self._hits + self._misses
+        hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
+        return {
+            "path": self.path,
+            "size": size,
+            "bytes": nbytes,
+            "max_bytes": self.max_bytes,
+            "pruned": self._pruned,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(hit_rate, 2),
+            "expirations": self._expirations,
+            "total_requests": total_requests
+        }
+
+
 class AnalysisCache:
     """Cache for obligation analysis results."""
     
-    def __init__(self, max_size: int = 1000):
+    def __init__(
+        self,
+        max_bytes: int = ANALYSIS_CACHE_MAX_BYTES,
+        ttl: float = ANALYSIS_CACHE_TTL,
+        disk_path: str = ANALYSIS_CACHE_PATH
+    ):
         """
         Initialize cache.
         
         Args:
-            max_size: Maximum number of cached results
+            max_bytes: Memory budget of the in-memory tier (L1), measured as
+                the serialized size of the cached results
+            ttl: Default seconds an L1 entry stays valid (0 = no expiry)
+            disk_path: SQLite file for the L2 tier, or empty to disable it
         """
-        self.max_size = max_size
-        self._cache: Dict[str, Dict[str, Any]] = {}
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (result, expires_at, nbytes), least recently used first
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk = DiskCache(disk_path, ttl) if disk_path else None
         self._hits = 0
         self._misses = 0
+        self._l1_hits = 0
+        self._evictions = 0
+        self._expirations = 0
     
-    def _generate_key(self, obligation: str, contract_hash: str) -> str:
+    def _generate_key(self, obligation: str, clause_hash: str, version: str = "") -> str:
         """
-        Generate cache key from obligation and contract.
+        Generate cache key from obligation and retrieved clauses.
         
         Args:
             obligation: Obligation text
-            contract_hash: Hash of contract content
+            clause_hash: Hash of the clauses sent with the obligation (hash_clauses)
+            version: Prompt version and model that produced the result
             
         Returns:
             Cache key
         """
-        combined = f"{obligation}|{contract_hash}"
+        combined = f"{obligation}|{clause_hash}|{version}"
         return hashlib.sha256(combined.encode()).hexdigest()
     
-    def get(self, obligation: str, contract_hash: str) -> Optional[Dict[str, Any]]:
+    def get(self, obligation: str, clause_hash: str, version: str = "") -> Optional[Dict[str, Any]]:
         """
-        Get cached result.
+        Get cached result, promoting L2 hits into memory.
         
         Args:
             obligation: Obligation text
-            contract_hash: Hash of contract content
+            clause_hash: Hash of the clauses sent with the obligation (hash_clauses)
+            version: Prompt version and model that produced the result
             
         Returns:
             Cached result or None if not found
         """
-        key = self._generate_key(obligation, contract_hash)
-        result = self._cache.get(key)
+        key = self._generate_key(obligation, clause_hash, version)
+        result = self._lookup(key)
+        if result is None and self._disk is not None:
+            found = self._disk.get(key)
+            if found is not None:
+                # Promote with only the lifetime the disk row has left
+                result, remaining = found
+                self._store(key, result, len(json.dumps(result)), remaining)
         
-        if result:
-            self._hits += 1
+        with self._lock:
+            if result is not None:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if result is not None:
             logger.info(f"Cache HIT for obligation: {obligation[:50]}...")
         else:
-            self._misses += 1
             logger.info(f"Cache MISS for obligation: {obligation[:50]}...")
         
         return result
     
-    def set(self, obligation: str, contract_hash: str, result: Dict[str, Any]) -> None:
+    def set(
+        self,
+        obligation: str,
+        clause_hash: str,
+        result: Dict[str, Any],
+        version: str = "",
+        ttl: Optional[float] = None
+    ) -> None:
         """
-        Store result in cache.
+        Store result in both tiers.
         
         Args:
             obligation: Obligation text
-            contract_hash: Hash of contract content
+            clause_hash: Hash of the clauses sent with the obligation (hash_clauses)
             result: Analysis result to cache
+            version: Prompt version and model that produced the result
+            ttl: Seconds the entry stays valid in both tiers (default: self.ttl)
         """
-        key = self._generate_key(obligation, contract_hash)
-        
-        # Implement simple LRU by removing oldest if at capacity
-        if len(self._cache) >= self.max_size:
-            # Remove first (oldest) item
-            oldest_key = next(iter(self._cache))
-            del self._cache[oldest_key]
-        
-        self._cache[key] = result
+        key = self._generate_key(obligation, clause_hash, version)
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, result, len(json.dumps(result)), ttl)
+        if self._disk is not None:
+            self._disk.set(key, result, ttl)
         logger.info(f"Cached result for obligation: {obligation[:50]}...")
     
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """L1 lookup; refreshes recency and drops expired entries."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            result, expires_at, nbytes = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._cache[key]
+                self._bytes -= nbytes
+                self._expirations += 1
+                return None
+            self._cache.move_to_end(key)
+            self._l1_hits += 1
+            return result
+    
+    def _store(self, key: str, result: Dict[str, Any], nbytes: int, ttl: float) -> None:
+        """Insert into the in-memory tier, evicting least recently used entries."""
+        if nbytes > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            while self._cache and self._bytes + nbytes > self.max_bytes:
+                _, (_, _, evicted_bytes) = self._cache.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self._evictions += 1
+            self._cache[key] = (result, expires_at, nbytes)
+            self._bytes += nbytes
+    
     def clear(self) -> None:
         """Clear all cached results."""
-        self._cache.clear()
-        self._hits = 0
-        self._misses = 0
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._l1_hits = 0
+            self._evictions = 0
+            self._expirations = 0
+        if self._disk is not None:
+            self._disk.clear()
         logger.info("Cache cleared")
     
     def get_stats(self) -> Dict[str, Any]:
@@ -96,33 +344,39 @@ class AnalysisCache:
         Returns:
             Dictionary with cache stats
         """
-        total_requests = self._hits + self._misses
-        hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
+        with self._lock:
+            size = len(self._cache)
+            nbytes = self._bytes
+            hits, misses, l1_hits = self._hits, self._misses, self._l1_hits
+            evictions, expirations = self._evictions, self._expirations
+        total_requests = hits + misses
+        hit_rate = (hits / total_requests * 100) if total_requests > 0 else 0
+        l1_hit_rate = (l1_hits / total_requests * 100) if total_requests > 0 else 0
         
         return {
-            "size": len(self._cache),
-            "max_size": self.max_size,
-            "hits": self._hits,
-            "misses": self._misses,
+            "size": size,
+            "hits": hits,
+            "misses": misses,
             "hit_rate": round(hit_rate, 2),
-            "total_requests": total_requests
+            "total_requests": total_requests,
+            "l1": {
+                "size": size,
+                "bytes": nbytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": l1_hits,
+                "misses": total_requests - l1_hits,
+                "hit_rate": round(l1_hit_rate, 2),
+                "evictions": evictions,
+                "expirations": expirations,
+                "total_requests": total_requests
+            },
+            "l2": self._disk.get_stats() if self._disk is not None else None
         }
 
 # Global cache instance
-_global_cache = AnalysisCache(max_size=1000)
+_global_cache = AnalysisCache()
 
 def get_cache() -> AnalysisCache:
     """Get global cache instance."""
     return _global_cache
-
-def hash_contract(contract_text: str) -> str:
-    """
-    Generate hash for contract content.
-    
-    Args:
-        contract_text: Full contract text
-        
-    Returns:
-        SHA256 hash of contract
-    """
-    return hashlib.sha256(contract_text.encode()).hexdigest()
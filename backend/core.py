@@ -5,21 +5,37 @@ import uuid
 import logging
 import json
 import hashlib
+import pickle
+import threading
+import contextvars
+from collections import OrderedDict
 import fitz  # PyMuPDF
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from dotenv import load_dotenv
-from keybert import KeyBERT
-from openai import OpenAI
-from langdetect import detect
-from googletrans import Translator
-from langchain_openai import OpenAIEmbeddings
+from langdetect import detect, DetectorFactory
 from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
 from sklearn.metrics.pairwise import cosine_similarity
 import time
+import asyncio
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from backend.translation_memory import get_translation_memory
+from backend.workers import run_blocking
+from backend.keyword_store import get_keyword_store, KEYWORD_STORE_PATH
+from backend.scheduler import get_scheduler, estimate_tokens, estimate_chat_tokens, is_rate_limit, RATE_LIMIT_RETRIES
+from backend.usage import track
+from backend.prompts import (
+    PROMPT_VERSION, STRUCTURED_OUTPUT, VALIDATION_STEPS, STEP_CODES,
+    ANALYSIS_RESPONSE_FORMAT, PACKED_RESPONSE_FORMAT, build_analysis_messages, build_packed_messages,
+    record_prompt_usage
+)
+from backend.models import (
+    get_client, get_async_client, get_embedder, get_translator, get_nlp, EMBEDDING_MODEL_NAME
+)
 
 # Setup logging
 logging.basicConfig(
@@ -29,66 +45,116 @@ logging.basicConfig(
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-# Validate environment variables
-if not os.getenv("OPENAI_API_KEY"):
-    logger.error("OPENAI_API_KEY not found in environment variables!")
-    raise ValueError("OPENAI_API_KEY must be set in .env file")
-
-# Initialize globals
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-embedder = OpenAIEmbeddings(model="text-embedding-3-small")
-kw_model = KeyBERT()
-translator = Translator()
-
-import spacy
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    # Download if not present (though usually better to do in docker/setup)
-    from spacy.cli import download
-    download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+# langdetect is randomised; seed it so profiling is reproducible across runs
+DetectorFactory.seed = 0
+
+# Heavy clients and models are built on first use by backend.models; these
+# names keep `from backend.core import embedder` (etc.) working for scripts.
+_LAZY_MODELS = {
+    "client": get_client,
+    "async_client": get_async_client,
+    "embedder": get_embedder,
+    "translator": get_translator,
+    "nlp": get_nlp,
+}
+
+def __getattr__(name):
+    if name in _LAZY_MODELS:
+        return _LAZY_MODELS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 USER_DIR = "user_memory"
 os.makedirs(USER_DIR, exist_ok=True)
 
-# Keyword cache directory
-KEYWORD_CACHE_DIR = os.path.join(USER_DIR, "keyword_cache")
-os.makedirs(KEYWORD_CACHE_DIR, exist_ok=True)
-KEYWORD_CACHE_FILE = os.path.join(KEYWORD_CACHE_DIR, "keywords.json")
+# Contract-keyed vector stores (reused across sessions and workers)
+VECTOR_STORE_DIR = os.path.join(USER_DIR, "vector_stores")
+os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+VECTOR_STORE_LRU_SIZE = int(os.getenv("VECTOR_STORE_LRU_SIZE", "8"))
+# Contract indexes kept on disk; the least recently used (by mtime) are removed
+VECTOR_STORE_DISK_MAX = int(os.getenv("VECTOR_STORE_DISK_MAX", "64"))
+# Bump when chunk metadata or index layout changes to invalidate stored indexes
+VECTOR_INDEX_VERSION = "3"
+# Translated line records saved next to each index, so hits skip translation
+VECTOR_RECORDS_FILE = "records.json"
 
-# Load keyword cache from disk
-def load_keyword_cache():
-    """Load keyword cache from disk."""
-    if os.path.exists(KEYWORD_CACHE_FILE):
-        try:
-            with open(KEYWORD_CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-                logger.info(f"Loaded keyword cache with {len(cache)} entries")
-                return cache
-        except Exception as e:
-            logger.warning(f"Failed to load keyword cache: {e}")
-            return {}
-    return {}
+# Number of pages sampled to classify a document's language
+LANGUAGE_SAMPLE_PAGES = int(os.getenv("LANGUAGE_SAMPLE_PAGES", "5"))
+# Characters of each page fed to the language detector
+LANGUAGE_SAMPLE_CHARS = 2000
 
-def save_keyword_cache(cache):
-    """Save keyword cache to disk."""
-    try:
-        with open(KEYWORD_CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, indent=2, ensure_ascii=False)
-        logger.info(f"Saved keyword cache with {len(cache)} entries")
-    except Exception as e:
-        logger.error(f"Failed to save keyword cache: {e}")
+# Batch translation: token budget per request and number of requests in flight
+TRANSLATION_BATCH_TOKENS = int(os.getenv("TRANSLATION_BATCH_TOKENS", "1500"))
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))
+
+# Chunking configuration (part of the vector store key)
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 300
+
+# Keyword cache: append-only SQLite store (migrates the old keywords.json)
+KEYWORD_CACHE_DIR = os.path.dirname(KEYWORD_STORE_PATH)
+KEYWORD_CACHE_FILE = KEYWORD_STORE_PATH
 
 def get_cache_key(obligation):
     """Generate cache key for an obligation."""
     return hashlib.sha256(obligation.encode('utf-8')).hexdigest()
 
-# Initialize keyword cache
-_keyword_cache = load_keyword_cache()
+# Initialize keyword cache (dict-like view of the keyword store)
+_keyword_cache = get_keyword_store()
 
 logger.info("Core module initialized successfully")
 
+def chat_completion(stage="llm", usage_keys=None, **request):
+    """
+    Send a chat completion through the model's rate-limit scheduler.
+
+    The raw response is used so the x-ratelimit-* headers reach the
+    scheduler, which then paces every other worker accordingly. The SDK does
+    not retry; a 429 is re-admitted through the scheduler, which backs off.
+
+    Args:
+        stage: Pipeline stage the call is billed to in the usage ledger
+        usage_keys: Obligations the call answers, for the per-obligation ledger
+    """
+    scheduler = get_scheduler(request["model"])
+    tokens = estimate_chat_tokens(request)
+    with track(stage, request["model"], usage_keys) as call:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                with scheduler.slot(tokens) as slot:
+                    call.queue_seconds += slot.queued_seconds
+                    raw = get_client().chat.completions.with_raw_response.create(**request)
+                    resp = raw.parse()
+                    slot.record(raw.headers, resp.usage.total_tokens if resp.usage else None)
+                break
+            except Exception as e:
+                if attempt == RATE_LIMIT_RETRIES or not is_rate_limit(e):
+                    raise
+                logger.warning(f"[{request['model']}] rate limited; retrying after the scheduler's backoff")
+        call.set_usage(resp.usage)
+    record_prompt_usage(request["model"], resp.usage)
+    return resp
+
+async def chat_completion_async(stage="llm", usage_keys=None, **request):
+    """Async variant of chat_completion on AsyncOpenAI."""
+    scheduler = get_scheduler(request["model"])
+    tokens = estimate_chat_tokens(request)
+    with track(stage, request["model"], usage_keys) as call:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                async with scheduler.slot_async(tokens) as slot:
+                    call.queue_seconds += slot.queued_seconds
+                    raw = await get_async_client().chat.completions.with_raw_response.create(**request)
+                    resp = raw.parse()
+                    slot.record(raw.headers, resp.usage.total_tokens if resp.usage else None)
+                break
+            except Exception as e:
+                if attempt == RATE_LIMIT_RETRIES or not is_rate_limit(e):
+                    raise
+                logger.warning(f"[{request['model']}] rate limited; retrying after the scheduler's backoff")
+        call.set_usage(resp.usage)
+    record_prompt_usage(request["model"], resp.usage)
+    return resp
+
 def detect_language(text):
     try:
         lang_code = detect(text)
@@ -100,31 +166,241 @@ def detect_language(text):
     except Exception:
         return "🌐"
 
+def translate_from(text, lang_code):
+    """Translate text whose source language is already known."""
+    memory = get_translation_memory()
+    cached = memory.get(lang_code, text)
+    if cached is not None:
+        return cached
+    try:
+        try:
+            with track("translation", "googletrans"):
+                translated = get_translator().translate(text, src=lang_code, dest="en").text
+            backend = "googletrans"
+        except Exception:
+            # fallback to OpenAI translate if googletrans fails
+            resp = chat_completion(
+                stage="translation",
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "Translate the following text to English precisely."},
+                    {"role": "user", "content": text}
+                ],
+                temperature=0
+            )
+            translated = resp.choices[0].message.content.strip()
+            backend = "openai"
+        memory.put(lang_code, backend, text, translated)
+        return translated
+    except Exception:
+        return text
+
 def translate_to_english(text):
     try:
         lang_code = detect(text)
         if lang_code != "en" and lang_code != "unknown":
-            try:
-                translated = translator.translate(text, src=lang_code, dest="en")
-                return translated.text
-            except Exception:
-                # fallback to OpenAI translate if googletrans fails
-                resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "Translate the following text to English precisely."},
-                        {"role": "user", "content": text}
-                    ],
-                    temperature=0
-                )
-                return resp.choices[0].message.content.strip()
+            return translate_from(text, lang_code)
         return text
     except Exception:
         return text
 
-def get_user_vector_path(session_id):
-    run_id = str(uuid.uuid4())[:8]
-    return os.path.join(USER_DIR, f"faiss_{session_id}_{run_id}")
+def _build_translation_batches(items, max_tokens=TRANSLATION_BATCH_TOKENS):
+    """
+    Group (record_index, text, lang) items into translation batches.
+
+    Consecutive lines in the same source language are packed together until
+    the token budget is reached, so batches follow page/chunk boundaries of
+    the document rather than single lines.
+
+    Returns:
+        List of (lang, record_indices, texts) tuples; record_indices is the
+        alignment map used to write results back to their lines
+    """
+    batches = []
+    cur_lang, cur_indices, cur_texts, cur_tokens = None, [], [], 0
+    for idx, text, lang in items:
+        tokens = estimate_tokens(text)
+        if cur_texts and (lang != cur_lang or cur_tokens + tokens > max_tokens):
+            batches.append((cur_lang, cur_indices, cur_texts))
+            cur_indices, cur_texts, cur_tokens = [], [], 0
+        cur_lang = lang
+        cur_indices.append(idx)
+        cur_texts.append(text)
+        cur_tokens += tokens
+    if cur_texts:
+        batches.append((cur_lang, cur_indices, cur_texts))
+    return batches
+
+def translate_batch(lines, lang_code):
+    """
+    Translate a batch of lines, preserving line alignment.
+
+    Lines found in the translation memory are not sent again. The rest go
+    out as one request: googletrans on the newline-joined batch, then a
+    single OpenAI JSON request, falling back to line-by-line translation
+    only when neither returns exactly one translation per input line.
+
+    Returns:
+        List of translated lines, same length and order as lines
+    """
+    memory = get_translation_memory()
+    translated = memory.get_many(lang_code, lines)
+    missing = [i for i, t in enumerate(translated) if t is None]
+    if missing:
+        missing_lines = [lines[i] for i in missing]
+        new_lines, backend = _translate_lines(missing_lines, lang_code)
+        if backend is not None:
+            memory.put_many(lang_code, backend, missing_lines, new_lines)
+        for i, text in zip(missing, new_lines):
+            translated[i] = text
+    return translated
+
+def _translate_lines(lines, lang_code):
+    """
+    Translate lines in bulk.
+
+    Returns:
+        (translated lines, backend name); backend is None when the per-line
+        fallback was used, which records its own translations
+    """
+    if not any("\n" in line for line in lines):
+        try:
+            with track("translation", "googletrans"):
+                translated = get_translator().translate("\n".join(lines), src=lang_code, dest="en").text.split("\n")
+            if len(translated) == len(lines):
+                return translated, "googletrans"
+        except Exception:
+            pass
+    
+    try:
+        resp = chat_completion(
+            stage="translation",
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "Translate each line of the given JSON array to English precisely. Return a JSON object with a key 'translations' containing an array with exactly one translated string per input line, in the same order."},
+                {"role": "user", "content": json.dumps(lines, ensure_ascii=False)}
+            ],
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        translated = json.loads(resp.choices[0].message.content).get("translations", [])
+        if isinstance(translated, list) and len(translated) == len(lines):
+            return [str(t) for t in translated], "openai"
+        logger.warning(f"Batch translation returned {len(translated)} lines for {len(lines)}; translating line by line")
+    except Exception as e:
+        logger.warning(f"Batch translation failed, translating line by line: {e}")
+    
+    return [translate_from(line, lang_code) for line in lines], None
+
+def _detect_page_language(lines):
+    try:
+        return detect("\n".join(lines)[:LANGUAGE_SAMPLE_CHARS])
+    except Exception:
+        return "unknown"
+
+def profile_document_language(records, sample_pages=LANGUAGE_SAMPLE_PAGES):
+    """
+    Classify the language of a document from a sample of its pages.
+
+    If every sampled page whose language could be detected agrees, that
+    language is assigned to the whole document; pages without detectable
+    text (signature lines, dates) do not count. Only when two languages are
+    found is the document treated as mixed and each page detected
+    individually.
+
+    Args:
+        records: Extracted line records
+        sample_pages: Number of evenly spaced pages to sample
+
+    Returns:
+        Dict with document_language ("mixed" when pages disagree) and
+        page_languages mapping page number to language code
+    """
+    pages = {}
+    for rec in records:
+        pages.setdefault(rec.get("page", 1), []).append(rec["text"])
+    page_nums = list(pages.keys())
+    if not page_nums:
+        return {"document_language": "en", "page_languages": {}}
+    
+    if len(page_nums) <= sample_pages:
+        sampled = page_nums
+    else:
+        step = (len(page_nums) - 1) / (sample_pages - 1) if sample_pages > 1 else 0
+        sampled = sorted({page_nums[round(i * step)] for i in range(sample_pages)})
+    sample_langs = {p: _detect_page_language(pages[p]) for p in sampled}
+    
+    distinct = set(sample_langs.values()) - {"unknown"}
+    if len(distinct) <= 1:
+        lang = distinct.pop() if distinct else "unknown"
+        return {"document_language": lang, "page_languages": {p: lang for p in page_nums}}
+    
+    page_languages = {
+        p: sample_langs[p] if p in sample_langs else _detect_page_language(pages[p])
+        for p in page_nums
+    }
+    return {"document_language": "mixed", "page_languages": page_languages}
+
+def translate_records(records):
+    """
+    Populate text_original/text_translated on every record.
+
+    The document language is profiled first; English documents (and English
+    pages of mixed documents) skip translation entirely. Remaining lines are
+    translated in token-bounded batches with bounded concurrency.
+
+    Returns:
+        Dict with the language profile and how many lines were sent for
+        translation
+    """
+    profile = profile_document_language(records)
+    page_languages = profile["page_languages"]
+    pending = []
+    
+    for idx, rec in enumerate(records):
+        rec["text_original"] = rec["text"]  # Preserve original
+        lang = page_languages.get(rec.get("page", 1), "unknown")
+        if lang == "en":
+            rec["text_translated"] = rec["text"]
+        elif lang == "unknown":
+            # Page-level detection failed; fall back to per-line detection
+            # and only send lines in a detected foreign language
+            line_lang = _detect_page_language([rec["text"]])
+            if line_lang in ("en", "unknown"):
+                rec["text_translated"] = rec["text"].strip()
+            else:
+                pending.append((idx, rec["text"], line_lang))
+        else:
+            pending.append((idx, rec["text"], lang))
+    
+    lines_translated = len(pending)
+    batches = _build_translation_batches(pending)
+    if batches:
+        with ThreadPoolExecutor(max_workers=TRANSLATION_CONCURRENCY) as executor:
+            # Copy the context per task so calls reach the request's usage ledger
+            futures = [
+                executor.submit(contextvars.copy_context().run, translate_batch, texts, lang)
+                for lang, _, texts in batches
+            ]
+            for (_, indices, _), future in zip(batches, futures):
+                for idx, text in zip(indices, future.result()):
+                    records[idx]["text_translated"] = text.strip()
+    
+    for rec in records:
+        rec["text"] = rec["text_translated"]  # Backward compatibility
+    
+    stats = {
+        "document_language": profile["document_language"],
+        "pages": len(page_languages),
+        "lines_total": len(records),
+        "lines_translated": lines_translated,
+        "translation_batches": len(batches),
+    }
+    logger.info(
+        f"Language profile: {stats['document_language']} "
+        f"({lines_translated}/{len(records)} lines sent for translation in {len(batches)} batches)"
+    )
+    return stats
 
 def extract_text_from_pdf(file_bytes):
     pdf = fitz.open(stream=file_bytes, filetype="pdf")
@@ -177,158 +453,417 @@ def chunk_text(records):
         pages_original[p].append(rec.get("text_original", rec.get("text", "")))
         page_line_map[p].append(line)
         
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=300)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     docs = []
     
     for page_num in pages_translated.keys():
         # Reconstruct page text with line tracking (use translated for chunking)
-        page_text_translated = "\n".join(pages_translated[page_num])
-        page_text_original = "\n".join(pages_original[page_num])
+        lines_translated = pages_translated[page_num]
+        lines_original = pages_original[page_num]
+        page_text_translated = "\n".join(lines_translated)
+        same_text = lines_translated == lines_original
         line_numbers = page_line_map[page_num]
         
-        # Get the starting line number for this page
-        starting_line = line_numbers[0] if line_numbers else 1
+        # Character offset at which each line starts, built once per page so
+        # chunk positions resolve to lines with bisect instead of re-counting
+        # newlines in ever-growing prefixes
+        line_starts = []
+        offset = 0
+        for text in lines_translated:
+            line_starts.append(offset)
+            offset += len(text) + 1
         
         # Split into meaningful chunks (using translated text)
         chunks_translated = splitter.split_text(page_text_translated)
         
-        # Calculate line numbers more accurately
-        current_char_pos = 0
+        search_from = 0
         for idx, chunk_translated in enumerate(chunks_translated):
-            # Find which line this chunk starts at by counting newlines up to this point
-            text_before_chunk = page_text_translated[:current_char_pos]
-            lines_before = text_before_chunk.count('\n')
-            
-            # Calculate the actual line number for this chunk
-            if lines_before < len(line_numbers):
-                chunk_line = line_numbers[lines_before]
-            else:
-                # Fallback if we're beyond tracked lines
-                chunk_line = starting_line + lines_before
+            # The splitter strips whitespace, so locate the chunk in the page.
+            # Chunks are emitted in order and share at most CHUNK_OVERLAP
+            # characters, so the next one cannot start before the end of this
+            # one minus the overlap (as LangChain computes start_index); this
+            # keeps repeated text from matching an earlier occurrence
+            chunk_start = page_text_translated.find(chunk_translated, search_from)
+            if chunk_start == -1:
+                chunk_start = search_from
+            chunk_end = chunk_start + len(chunk_translated)
+            search_from = max(chunk_start + 1, chunk_end - CHUNK_OVERLAP)
             
-            # Extract corresponding original text chunk
-            # Find the character positions in the original text
-            chunk_end_pos = current_char_pos + len(chunk_translated)
+            first_idx = bisect_right(line_starts, chunk_start) - 1
+            last_idx = bisect_right(line_starts, max(chunk_start, chunk_end - 1)) - 1
+            line_start = line_numbers[first_idx]
+            line_end = line_numbers[last_idx]
             
-            # Map to original text (approximate by character position)
-            # This is a best-effort mapping since translations may differ in length
-            original_start = current_char_pos
-            original_end = min(chunk_end_pos, len(page_text_original))
-            chunk_original = page_text_original[original_start:original_end]
+            # Original text for PDF highlighting: identical offsets when nothing
+            # was translated, otherwise the original lines the chunk spans
+            if same_text:
+                chunk_original = chunk_translated
+            else:
+                chunk_original = "\n".join(lines_original[first_idx:last_idx + 1])
             
             docs.append(Document(
                 page_content=chunk_translated,  # Use translated for RAG
                 metadata={
                     "page": page_num, 
-                    "line": chunk_line, 
+                    "line": line_start, 
+                    "line_start": line_start,
+                    "line_end": line_end,
                     "chunk_id": idx,
                     "text_original": chunk_original  # Store original for highlighting
                 }
             ))
             
-            # Update position for next chunk
-            current_char_pos += len(chunk_translated)
-            
     return docs
 
-def build_vector_store(docs, path):
+def build_vector_store(docs, path, records=None):
+    vs = FAISS.from_documents(docs, get_embedder())
+    # Save to a private directory and rename into place so concurrent
+    # workers never observe (or load) a half-written index
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+    vs.save_local(tmp_path)
+    if records is not None:
+        with open(os.path.join(tmp_path, VECTOR_RECORDS_FILE), "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
     if os.path.exists(path):
         shutil.rmtree(path)
-    vs = FAISS.from_documents(docs, embedder)
-    vs.save_local(path)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another worker published the same index first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return vs
+
+def get_contract_vector_key(records):
+    """
+    Key a contract's vector store by its extracted text and ingestion config.
+
+    Args:
+        records: Extracted line records (before translation)
+
+    Returns:
+        SHA256 hex digest identifying the vector store
+    """
+    h = hashlib.sha256()
+    config = {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "index_version": VECTOR_INDEX_VERSION,
+    }
+    h.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    for rec in records:
+        h.update(f"{rec.get('page', 1)}\t{rec.get('line', 1)}\t{rec.get('text', '')}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def get_contract_vector_path(vector_key):
+    return os.path.join(VECTOR_STORE_DIR, vector_key)
+
+def load_vector_store(path):
+    """Load a saved FAISS store, memory-mapping the index where supported."""
+    import faiss
+    index_file = os.path.join(path, "index.faiss")
+    try:
+        index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(index_file)
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(get_embedder(), index, docstore, index_to_docstore_id)
+
+def _touch(path):
+    """Mark a stored index as recently used for prune_vector_stores."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def prune_vector_stores(max_stores=None):
+    """
+    Remove the least recently used contract indexes beyond max_stores.
+
+    Recency is the directory mtime, refreshed on every load, so all workers
+    sharing VECTOR_STORE_DIR agree on it. Leftover temporary directories of
+    interrupted builds are removed after an hour.
+
+    Returns:
+        Number of directories removed
+    """
+    max_stores = VECTOR_STORE_DISK_MAX if max_stores is None else max_stores
+    stores = []
+    removed = 0
+    now = time.time()
+    for name in os.listdir(VECTOR_STORE_DIR):
+        path = os.path.join(VECTOR_STORE_DIR, name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        if ".tmp-" in name:
+            if now - mtime > 3600:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+            continue
+        stores.append((mtime, path))
+    stores.sort(reverse=True)
+    for _, path in stores[max_stores:]:
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    if removed:
+        logger.info(f"Pruned {removed} vector store directories")
+    return removed
+
+# Bounded LRU of loaded (vector store, translated records) pairs so hot
+# contracts skip translation and ingestion entirely
+_vector_store_lru = OrderedDict()
+_vector_store_lock = threading.Lock()
+
+def _remember_vector_store(vector_key, vs, records):
+    with _vector_store_lock:
+        _vector_store_lru[vector_key] = (vs, records)
+        _vector_store_lru.move_to_end(vector_key)
+        while len(_vector_store_lru) > VECTOR_STORE_LRU_SIZE:
+            _vector_store_lru.popitem(last=False)
+
+def load_contract_store(vector_key):
+    """
+    Return the stored index of an already ingested contract.
+
+    Lookup order: in-memory LRU, then the index persisted on disk.
+
+    Args:
+        vector_key: Key from get_contract_vector_key
+
+    Returns:
+        Tuple of (vector store, translated records), or None on a miss
+    """
+    path = get_contract_vector_path(vector_key)
+    with _vector_store_lock:
+        entry = _vector_store_lru.get(vector_key)
+        if entry is not None:
+            _vector_store_lru.move_to_end(vector_key)
+    if entry is not None:
+        _touch(path)
+        logger.info(f"Vector store LRU hit: {vector_key[:12]}")
+        return entry
+
+    records_file = os.path.join(path, VECTOR_RECORDS_FILE)
+    if not os.path.exists(records_file):
+        return None
+    try:
+        vs = load_vector_store(path)
+        with open(records_file, encoding="utf-8") as f:
+            records = json.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load vector store {path}, rebuilding: {e}")
+        return None
+    _touch(path)
+    logger.info(f"Loaded persisted vector store: {vector_key[:12]}")
+    _remember_vector_store(vector_key, vs, records)
+    return vs, records
+
+def build_contract_store(records, vector_key):
+    """
+    Chunk, embed and persist a contract's translated records.
+
+    Args:
+        records: Line records with text_translated/text_original populated
+        vector_key: Key from get_contract_vector_key
+
+    Returns:
+        FAISS vector store
+    """
+    vs = build_vector_store(chunk_text(records), get_contract_vector_path(vector_key), records)
+    logger.info(f"Built vector store: {vector_key[:12]}")
+    _remember_vector_store(vector_key, vs, records)
+    prune_vector_stores()
     return vs
 
+def load_or_build_vector_store(records, vector_key, progress=None):
+    """
+    Return the vector store and translated records for a contract,
+    translating and embedding it only on first sight.
+
+    Args:
+        records: Extracted line records (translated in place on a miss)
+        vector_key: Key from get_contract_vector_key
+        progress: Optional callback(stage, completed, total); on a miss it
+            gets "translating" with the lines sent for translation out of
+            the total, then "embedding"
+
+    Returns:
+        Tuple of (FAISS vector store, translated records)
+    """
+    stored = load_contract_store(vector_key)
+    if stored is not None:
+        return stored
+    if progress is not None:
+        progress("translating", None, len(records))
+    translation = translate_records(records)
+    if progress is not None:
+        progress("translating", translation["lines_translated"], translation["lines_total"])
+        progress("embedding", None, None)
+    return build_contract_store(records, vector_key), records
+
+# Keyword generation: requests in flight, and obligations per request
+# (1 = one request per obligation; larger values use one JSON request per batch)
+KEYWORD_CONCURRENCY = int(os.getenv("KEYWORD_CONCURRENCY", "8"))
+KEYWORD_BATCH_SIZE = int(os.getenv("KEYWORD_BATCH_SIZE", "1"))
+
+KEYWORD_GUIDANCE = "CRITICAL: You must predict the **exact words** a vendor would use to **limit** or **avoid** this obligation.\n- Example: If obligation is 'fix', search for 'refund', 'credit', 'obsolescence'.\n- Example: If obligation is 'indemnify', search for 'defend', 'hold harmless', 'control of defense'.\n- Example: If obligation is 'unlimited', search for 'cap', 'aggregate liability', 'fees paid'.\n\nFocus on specific nouns and verbs found in the contract text."
+KEYWORD_SYSTEM_PROMPT = "You are a legal search expert. Return a JSON object with a key 'keywords' containing 5-8 search terms for the given obligation. \n\n" + KEYWORD_GUIDANCE
+KEYWORD_BATCH_SYSTEM_PROMPT = "You are a legal search expert. You are given a JSON array of obligations. Return a JSON object with a key 'results' containing one object per obligation, in the same order, each with 'id' (its 1-based position) and 'keywords' (5-8 search terms for that obligation). \n\n" + KEYWORD_GUIDANCE
+
+# HYBRID STRATEGY: Combine LLM's context-aware keywords with a "Universal Safety Net"
+# These terms are universally relevant for finding limitations/escapes in ANY contract.
+UNIVERSAL_DANGER_WORDS = ["refund", "reimburse", "terminate", "cap", "limit", "sole discretion", "exclusive remedy", "unless", "except", "notwithstanding", "subject to", "provided that"]
+
+def _finalize_keywords(keywords):
+    # Deduplicate and sort for consistency
+    return sorted(set([str(k) for k in keywords] + UNIVERSAL_DANGER_WORDS))
+
+def _fallback_keywords(ob):
+    """Keywords without the LLM: simple noun chunks + danger words."""
+    try:
+        doc = get_nlp()(ob)
+        base_kws = [chunk.text.lower() for chunk in doc.noun_chunks]
+        base_kws.extend(["refund", "reimburse", "terminate", "cap", "limit"])
+        return sorted(list(set(base_kws)))
+    except:
+        return sorted(ob.split()[:5] + ["refund", "reimburse", "terminate"])
+
+def _keywords_for(ob):
+    """Generate keywords for one obligation with its own LLM request."""
+    try:
+        logger.info(f"Generating keywords for: {ob[:50]}...")
+        
+        # Dynamic LLM-based keyword generation for generic applicability
+        response = chat_completion(
+            stage="keywords",
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": KEYWORD_SYSTEM_PROMPT},
+                {"role": "user", "content": ob}
+            ],
+            temperature=0.0,  # Changed from 0.2 to 0.0 for determinism
+            seed=42,  # Added seed for reproducibility
+            response_format={"type": "json_object"}
+        )
+        res_text = response.choices[0].message.content
+        logger.debug(f"LLM keyword response for '{ob[:30]}...': {res_text}")
+        
+        parsed = json.loads(res_text)
+        return _finalize_keywords(parsed.get("keywords", []))
+        
+    except Exception as e:
+        logger.error(f"Keyword generation failed for '{ob}': {e}")
+        return _fallback_keywords(ob)
+
+def _keywords_for_batch(obs):
+    """
+    Generate keywords for several obligations with one structured JSON request.
+
+    Obligations missing from the answer get their own request.
+
+    Returns:
+        Dict mapping obligation to keywords
+    """
+    if len(obs) == 1:
+        return {obs[0]: _keywords_for(obs[0])}
+    
+    generated = {}
+    try:
+        logger.info(f"Generating keywords for {len(obs)} obligations in one request")
+        response = chat_completion(
+            stage="keywords",
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": KEYWORD_BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps(obs, ensure_ascii=False)}
+            ],
+            temperature=0.0,
+            seed=42,
+            response_format={"type": "json_object"}
+        )
+        for item in json.loads(response.choices[0].message.content).get("results", []):
+            idx = int(item.get("id", 0)) - 1
+            keywords = item.get("keywords")
+            if 0 <= idx < len(obs) and isinstance(keywords, list) and keywords:
+                generated[obs[idx]] = _finalize_keywords(keywords)
+    except Exception as e:
+        logger.warning(f"Batched keyword generation failed, generating per obligation: {e}")
+    
+    for ob in obs:
+        if ob not in generated:
+            generated[ob] = _keywords_for(ob)
+    return generated
+
 def generate_dynamic_keywords(obligations):
-    """Generate keywords for obligations with persistent caching for consistency."""
-    global _keyword_cache
+    """
+    Generate keywords for obligations with persistent caching for consistency.
+
+    Uncached obligations are generated concurrently (KEYWORD_CONCURRENCY
+    requests in flight, paced by the shared rate-limit scheduler), one
+    request per KEYWORD_BATCH_SIZE obligations.
+    """
     keywords_dict = {}
-    cache_updated = False
+    cached = _keyword_cache.get_many([get_cache_key(ob) for ob in obligations])
     
-    for ob in obligations:
+    missing = []
+    for ob in dict.fromkeys(obligations):
         cache_key = get_cache_key(ob)
         
         # Check cache first
-        if cache_key in _keyword_cache:
-            keywords_dict[ob] = _keyword_cache[cache_key]
+        if cache_key in cached:
+            keywords_dict[ob] = cached[cache_key]
             logger.info(f"Using cached keywords for: {ob[:50]}...")
-            continue
+        else:
+            missing.append(ob)
+    
+    if missing:
+        batch_size = max(1, KEYWORD_BATCH_SIZE)
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, min(KEYWORD_CONCURRENCY, len(batches)))) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, _keywords_for_batch, batch) for batch in batches]
+            for future in futures:
+                keywords_dict.update(future.result())
         
-        # Generate new keywords if not in cache
-        try:
-            logger.info(f"Generating keywords for: {ob[:50]}...")
-            
-            # Dynamic LLM-based keyword generation for generic applicability
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a legal search expert. Return a JSON object with a key 'keywords' containing 5-8 search terms for the given obligation. \n\nCRITICAL: You must predict the **exact words** a vendor would use to **limit** or **avoid** this obligation.\n- Example: If obligation is 'fix', search for 'refund', 'credit', 'obsolescence'.\n- Example: If obligation is 'indemnify', search for 'defend', 'hold harmless', 'control of defense'.\n- Example: If obligation is 'unlimited', search for 'cap', 'aggregate liability', 'fees paid'.\n\nFocus on specific nouns and verbs found in the contract text."},
-                    {"role": "user", "content": ob}
-                ],
-                temperature=0.0,  # Changed from 0.2 to 0.0 for determinism
-                seed=42,  # Added seed for reproducibility
-                response_format={"type": "json_object"}
-            )
-            res_text = response.choices[0].message.content
-            logger.debug(f"LLM keyword response for '{ob[:30]}...': {res_text}")
-            
-            parsed = json.loads(res_text)
-            keywords = parsed.get("keywords", [])
-            
-            # HYBRID STRATEGY: Combine LLM's context-aware keywords with a "Universal Safety Net"
-            # These terms are universally relevant for finding limitations/escapes in ANY contract.
-            universal_danger_words = ["refund", "reimburse", "terminate", "cap", "limit", "sole discretion", "exclusive remedy", "unless", "except", "notwithstanding", "subject to", "provided that"]
-            keywords.extend(universal_danger_words)
-            
-            # Deduplicate and sort for consistency
-            keywords = sorted(list(set(keywords)))
-            keywords_dict[ob] = keywords
-            
-            # Cache the result
-            _keyword_cache[cache_key] = keywords
-            cache_updated = True
-            
-        except Exception as e:
-            logger.error(f"Keyword generation failed for '{ob}': {e}")
-            # Fallback: simple noun chunks + danger words
-            try:
-                doc = nlp(ob)
-                base_kws = [chunk.text.lower() for chunk in doc.noun_chunks]
-                base_kws.extend(["refund", "reimburse", "terminate", "cap", "limit"])
-                keywords = sorted(list(set(base_kws)))
-                keywords_dict[ob] = keywords
-                _keyword_cache[cache_key] = keywords
-                cache_updated = True
-            except:
-                keywords = sorted(ob.split()[:5] + ["refund", "reimburse", "terminate"])
-                keywords_dict[ob] = keywords
-                _keyword_cache[cache_key] = keywords
-                cache_updated = True
-    
-    # Save cache if updated
-    if cache_updated:
-        save_keyword_cache(_keyword_cache)
+        # Append only the new entries
+        _keyword_cache.put_many({get_cache_key(ob): keywords_dict[ob] for ob in missing})
                 
     return keywords_dict
 
 
+def steps_from_codes(codes, reason):
+    """
+    Build the validation steps from the model's per-step codes.
+
+    Args:
+        codes: Dict with "s1".."s7" step codes (see STEP_CODES)
+        reason: The verdict reason, used as the finding of failed steps
+    """
+    steps = []
+    for n, (name, pass_finding, is_critical) in enumerate(VALIDATION_STEPS, start=1):
+        status = STEP_CODES.get(str(codes.get(f"s{n}", "NA")).upper(), "N/A")
+        if status == "PASS":
+            finding = pass_finding
+        elif status == "N/A":
+            finding = "Not applicable."
+        else:
+            finding = reason
+        steps.append({"step_number": n, "step_name": name, "status": status, "finding": finding, "is_critical": is_critical})
+    return steps
+
 def create_fallback_steps(final_status, reason):
     """
     Generate step-by-step visualization based on the final decision and reason.
-    Since we reverted to the original prompt for accuracy, we reconstruct the steps
-    here to provide the UI with the expected data structure.
+    Used when the model did not report per-step codes (legacy free-text
+    prompt, or no verdict at all): the steps are reconstructed heuristically
+    to provide the UI with the expected data structure.
     """
     reason_lower = reason.lower() if reason else ""
     
     # Default: All PASS if Yes, FAIL on match/conflict if No
-    steps = [
-        {"step_number": 1, "step_name": "Identify Obligation Purpose", "status": "PASS", "finding": "Obligation purpose identified.", "is_critical": False},
-        {"step_number": 2, "step_name": "Analyze Clause Effect", "status": "PASS", "finding": "Clause effect analyzed.", "is_critical": False},
-        {"step_number": 3, "step_name": "Match Analysis", "status": "PASS", "finding": "Clause matches obligation.", "is_critical": False},
-        {"step_number": 4, "step_name": "Material Conflicts Check", "status": "PASS", "finding": "No material conflicts found.", "is_critical": False},
-        {"step_number": 5, "step_name": "Termination Check", "status": "PASS", "finding": "No termination options found.", "is_critical": True},
-        {"step_number": 6, "step_name": "Discretion Check", "status": "PASS", "finding": "Discretion is acceptable.", "is_critical": True},
-        {"step_number": 7, "step_name": "Negative Obligation Check", "status": "N/A", "finding": "Not applicable.", "is_critical": True}
-    ]
+    steps = steps_from_codes({f"s{n}": "P" for n in range(1, 7)}, reason)
     
     if final_status == "No":
         # Heuristic: Try to identify which step failed based on keywords in the reason
@@ -360,209 +895,378 @@ def create_fallback_steps(final_status, reason):
             
     return steps
 
-def query_rag(vs, obligation, auto_keywords, top_k=10):
-    retriever = vs.as_retriever(search_type="similarity", search_kwargs={"k": top_k})
-    docs = retriever.get_relevant_documents(obligation)
+# Below this many chunks, batch retrieval scores obligations against every
+# chunk with one NumPy matmul instead of a FAISS search. Single queries always
+# go through FAISS to avoid reconstructing the index on each call.
+MATMUL_RETRIEVAL_MAX_CHUNKS = int(os.getenv("MATMUL_RETRIEVAL_MAX_CHUNKS", "5000"))
+
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def search_vectors(vs, query_vectors, top_k=10):
+    """
+    Retrieve the top_k chunk ids and cosine scores for a batch of query vectors.
+
+    Scores are computed against the vectors already stored in the FAISS index,
+    so no chunk is ever re-embedded. A multi-query batch against a small index
+    is scored with a single queries x chunks matmul; single queries and larger
+    indexes use FAISS search, so one lookup never copies the whole index.
+
+    Returns:
+        One list of (chunk_index, similarity) tuples per query, best first.
+    """
+    queries = np.asarray(query_vectors, dtype=np.float32)
+    if queries.ndim == 1:
+        queries = queries.reshape(1, -1)
+    ntotal = vs.index.ntotal
+    k = min(top_k, ntotal)
+    if k == 0:
+        return [[] for _ in range(len(queries))]
+
+    if len(queries) > 1 and ntotal <= MATMUL_RETRIEVAL_MAX_CHUNKS:
+        try:
+            chunk_matrix = vs.index.reconstruct_n(0, ntotal)
+        except RuntimeError:
+            chunk_matrix = None
+        if chunk_matrix is not None:
+            sims = _unit_rows(queries) @ _unit_rows(chunk_matrix).T
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            results = []
+            for row, cand in zip(sims, top):
+                ordered = cand[np.argsort(-row[cand])]
+                results.append([(int(i), float(row[i])) for i in ordered])
+            return results
+
+    distances, indices = vs.index.search(queries, k)
+    unit_queries = _unit_rows(queries)
+    results = []
+    for q, dist_row, idx_row in zip(unit_queries, distances, indices):
+        hits = []
+        for dist, idx in zip(dist_row, idx_row):
+            if idx == -1:
+                # FAISS pads with -1 when the index holds fewer than k vectors
+                continue
+            try:
+                doc_vec = vs.index.reconstruct(int(idx))
+                score = float(cosine_similarity([q], [doc_vec])[0][0])
+            except RuntimeError:
+                # Index type without direct map: derive cosine from squared L2
+                # distance (OpenAI embeddings are unit-normalised)
+                score = float(1.0 - dist / 2.0)
+            hits.append((int(idx), score))
+        results.append(hits)
+    return results
+
+def resolve_hits(vs, chunk_hits):
+    """Map (chunk_index, similarity) tuples to (Document, similarity) tuples."""
+    return [
+        (vs.docstore.search(vs.index_to_docstore_id[idx]), score)
+        for idx, score in chunk_hits
+    ]
+
+def search_by_vector(vs, query_vector, top_k=10):
+    """
+    Retrieve the top_k chunks for an already-embedded query.
+
+    Returns:
+        List of (Document, similarity) tuples, best first.
+    """
+    return resolve_hits(vs, search_vectors(vs, [query_vector], top_k)[0])
+
+def batch_retrieve(vs, obligations, top_k=10):
+    """
+    Retrieve chunks for every obligation at once.
+
+    All obligations are embedded in a single embed_documents batch and
+    searched together, so retrieval cost no longer grows with one embedding
+    round-trip per obligation.
+
+    Returns:
+        Dict mapping obligation text to its list of (Document, similarity) hits.
+    """
+    unique_obligations = list(dict.fromkeys(obligations))
+    if not unique_obligations:
+        return {}
+    vectors = get_embedder().embed_documents(unique_obligations)
+    chunk_hits = search_vectors(vs, vectors, top_k)
+    return {
+        ob: resolve_hits(vs, hits)
+        for ob, hits in zip(unique_obligations, chunk_hits)
+    }
+
+# Model and retry policy for obligation analysis
+ANALYSIS_MODEL = "gpt-4o-mini"
+LLM_MAX_RETRIES = 3
+# Output budget per obligation with structured output
+STRUCTURED_MAX_TOKENS = 400
+
+# Packed decisions: obligations with overlapping clauses share one LLM call
+PACKED_DECISIONS = os.getenv("PACKED_DECISIONS", "false").lower() == "true"
+PACK_MAX_OBLIGATIONS = int(os.getenv("PACK_MAX_OBLIGATIONS", "4"))
+# Minimum share of an obligation's clauses already in a group to join it
+PACK_MIN_OVERLAP = float(os.getenv("PACK_MIN_OVERLAP", "0.5"))
+
+def analysis_request_kwargs(messages):
+    """Keyword arguments for the chat completion that analyses an obligation."""
+    return dict(
+        model=ANALYSIS_MODEL,
+        messages=messages,
+        temperature=0.0,  # Deterministic reasoning
+        seed=42,      # Fixed seed for reproducibility
+        **(
+            dict(max_tokens=STRUCTURED_MAX_TOKENS, response_format=ANALYSIS_RESPONSE_FORMAT)
+            if STRUCTURED_OUTPUT else dict(max_tokens=800)
+        )
+    )
+
+def no_clauses_result(obligation):
+    return {
+        "obligation": obligation, "is_present": "No", "reason": "No relevant clauses retrieved.",
+        "similarity_score": 0.0, "keyword_hits": [], "confidence": 0.0,
+        "page": None, "line": None, "supporting_clauses": [],
+        "suggestion": "Unable to find relevant clauses in the contract.",
+        "cot_steps": create_fallback_steps("No", "No relevant clauses retrieved.")
+    }
+
+def prepare_rag_context(vs, obligation, auto_keywords, top_k=10, hits=None):
+    """
+    Retrieval and scoring stage of query_rag (everything before the LLM call).
+
+    Args:
+        hits: Precomputed (Document, similarity) tuples from batch_retrieve
+
+    Returns:
+        Dict with docs, best_doc, best_score, keyword_hits, confidence and
+        messages, or None when no clauses were retrieved
+    """
+    if hits is None:
+        ob_emb = get_embedder().embed_query(obligation)
+        hits = search_by_vector(vs, ob_emb, top_k)
+    docs = [doc for doc, _ in hits]
     
     if not docs:
-        return {
-            "obligation": obligation, "is_present": "No", "reason": "No relevant clauses retrieved.",
-            "similarity_score": 0.0, "keyword_hits": [], "confidence": 0.0,
-            "page": None, "line": None, "supporting_clauses": [],
-            "suggestion": "Unable to find relevant clauses in the contract.",
-            "cot_steps": create_fallback_steps("No", "No relevant clauses retrieved.")
-        }
+        return None
     
-    ob_emb = embedder.embed_query(obligation)
-    doc_embs = [embedder.embed_query(d.page_content) for d in docs]
-    sims = cosine_similarity([ob_emb], doc_embs)[0]
+    # Reuse the stored chunk vectors instead of re-embedding every chunk
+    sims = [score for _, score in hits]
     best_idx = int(np.argmax(sims))
     best_doc = docs[best_idx]
     best_score = float(sims[best_idx])
     
     obligation_keywords = auto_keywords.get(obligation, [])
     keyword_hits = [kw for kw in obligation_keywords if kw.lower() in best_doc.page_content.lower()]
-    keyword_ratio = len(keyword_hits) / max(1, len(obligation_keywords))
-    
-    # Cosine Similarity Only for Confidence
-    confidence = round(best_score * 100, 1)
-    
-    # Generic Principle-Based Prompt
-    prompt = f"""
-You are a contract compliance analyst. Analyze whether the contract clause satisfies the obligation.
-
-CRITICAL: Focus on LEGAL EFFECT and COMMERCIAL OUTCOME, not exact wording.
-
-MANDATORY PRE-CHECKS (Check these FIRST before any other analysis):
-
-1. ⚠️ TERMINATION CHECK: 
-   - IF Obligation requires: "continued use", "ensure access", "maintain availability" (PRIMARY GOAL)
-   - AND Clause offers: "reimburse", "refund", "credit" (TERMINATION OPTION)
-   - THEN Result: "No" (Conflict: Termination ≠ Continued Use)
-   - EXCEPTION: If "secure rights" is just a METHOD to remedy infringement, this check does NOT apply.
-
-2. ⚠️ NEGATIVE OBLIGATION CHECK:
-   - IF Obligation says: "does NOT have to", "NOT liable", "no obligation"
-   - AND Clause has: "unless", "except", "provided that" conditions
-   - AND Conditions: RE-IMPOSE the liability the obligation excluded
-   - THEN Result: "No" (Conflict: Exceptions negate the exclusion)
-
-INSTRUCTION: If ANY pre-check fails, stop immediately and return "No". Do not over-analyze.
-
-Analysis Framework:
-1. **Identify the Obligation's Purpose**: What commercial outcome or risk allocation does the obligation seek?
-2. **Analyze the Clause's Effect**: Does the clause achieve the same outcome or provide equivalent protection?
-3. **Apply Materiality Test**: Is there a material difference that significantly changes the business value or risk?
-
-Return "Yes" if:
-- The clause achieves the same commercial/legal outcome as the obligation
-- Any differences are immaterial or standard legal practice
-- Alternative methods to achieve the result are acceptable
-
-Return "No" ONLY if:
-- The clause negates the obligation's core purpose
-- The clause introduces a material escape that significantly shifts risk
-- The clause narrows the obligation in a way that excludes common scenarios
-- The clause adds conditions that re-impose obligations the original sought to exclude
-
-Key Principles:
-
-**Alternative Remedies**: Multiple paths to the same outcome = compliant
-- Example: "modify OR secure licenses" both prevent infringement and ensure continued use → YES
-- Example: "fix OR refund and terminate" have different outcomes (continued use vs. termination) → NO
-- CRITICAL: "Secure licenses", "procure rights", "obtain permissions" mean CONTINUED USE (not termination) → These are acceptable alternatives to modification
-- CRITICAL: "Reimburse", "refund", "credit" are TERMINATION options (customer gets money back and stops using the product)
-- If the obligation requires "continued use", "replace", or "secure rights", and the clause offers "reimburse/refund/credit" as an alternative, this is a material deviation → NO
-- Example: Obligation requires "secure continued use OR replace". Clause offers "secure rights OR substitute OR reimburse". The "reimburse" option allows termination instead of continued use → NO
-
-**Discretion**: Discretion about HOW to achieve a result ≠ discretion about WHETHER to achieve it
-- Example: "Vendor chooses remedy method (fix, license, replace)" = discretion on HOW → YES
-- Example: "Vendor may provide support if deemed reasonable" = discretion on WHETHER → NO
-- CRITICAL: If the clause says "at vendor's sole discretion" but provides multiple remedy options (e.g., "modify OR secure licenses"), the vendor MUST act - they just choose which method → This is discretion on HOW, not WHETHER → YES
-- CRITICAL: Look for the COMMITMENT to achieve the result. If the clause commits to achieving the outcome (e.g., "ensure continued use", "remedy infringement"), the discretion is only about the method
-- Example: "Vendor may, at its sole discretion, implement modifications OR secure licenses to ensure continued use" → Vendor MUST ensure continued use (commitment), discretion is only on method (modify vs. license) → YES
-
-**Standard Exceptions**: Legal/regulatory carve-outs are acceptable for POSITIVE obligations
-- Example: "keep confidential UNLESS required by law" = standard exception → YES
-- Example: "not liable for damages EXCEPT gross negligence" = standard exception → YES
-- Example: "keep confidential UNLESS needed for business purposes" = broad exception → NO
-
-**Negative Obligations (Exclusions)**: If the obligation says vendor is "NOT liable" or "does not have to" do something, analyze carefully:
-- The PURPOSE is to EXCLUDE vendor liability in specific scenarios
-- If the clause adds "unless" or "except" conditions, ask: Do these conditions RE-IMPOSE the liability the obligation sought to exclude?
-- If YES (the exceptions re-impose liability), return "No" - the exceptions negate the exclusion
-- CONCRETE EXAMPLE: 
-  - Obligation: "Vendor does not have to indemnify Bank if infringement is solely from Bank's unauthorized modification."
-  - Clause: "Vendor has no obligation UNLESS: (1) modification was required by license, (2) modification was required by documentation, (3) modification was mutually agreed."
-  - Analysis: These "unless" exceptions RE-IMPOSE indemnification liability for common scenarios (modifications required by docs, etc.), negating the exclusion → "No"
-- The key question: Do the exceptions make the vendor liable again for scenarios the obligation said they should NOT be liable for? If yes → "No"
-
-**Scope**: Broad exceptions that negate "all" or "any" = material conflict
-- Example: "return ALL info EXCEPT for business, legal, disaster recovery" = negates "ALL" → NO
-- Example: "indemnify EXCEPT customer modifications" = standard carve-out → YES
-
-Return JSON:
-{{
-  "is_present": "Yes" or "No",
-  "reason": "Explain the legal effect and whether it matches the obligation's purpose",
-  "suggestion": "If 'No', suggest specific language to achieve compliance. If 'Yes', return null."
-}}
-
-Obligation:
-{obligation}
-
-Relevant Clauses:
-{chr(10).join([d.page_content for d in docs])}
-"""
-    logger.debug(f"Generated Prompt for '{obligation[:50]}...': {prompt[:500]}...")
-
-    llm_status, llm_reason = "No", ""
-    try:
-        # Chain-of-Thought Analysis with GPT-4o-mini
-        cot_prompt = f"""
-{prompt}
-
-IMPORTANT: Before providing your final JSON answer, you MUST think step-by-step:
-
-Step 1: What is the EXACT purpose of the obligation? (What outcome does it seek?)
-Step 2: What does the clause ACTUALLY say? (Summarize the legal effect)
-Step 3: Do they match? (Does the clause achieve the same outcome?)
-Step 4: Are there any material conflicts? (Does the clause negate or weaken the obligation?)
-Step 5: CRITICAL CHECK - If the obligation requires "continued use", "replace", or "secure rights", does the clause offer "reimburse", "refund", or "credit" as an option? If YES, this is a TERMINATION option that conflicts with continued use → Answer must be "No"
-Step 6: CRITICAL CHECK - If the clause says "at vendor's sole discretion", does it provide multiple remedy options (e.g., "modify OR secure licenses")? If YES, this is discretion on HOW (method), not WHETHER (outcome) → The vendor MUST act, they just choose the method → Answer should be "Yes" if the methods achieve the same outcome
-Step 7: NEGATIVE OBLIGATION CHECK - If the obligation says "does NOT have to" or "NOT liable" or "no obligation", check if the clause has "unless" or "except" conditions. Ask: Do these conditions RE-IMPOSE the liability the obligation sought to EXCLUDE? If YES (the exceptions make vendor liable again for scenarios the obligation excluded) → Answer MUST be "No"
-
-After completing these steps, provide your final JSON answer.
-"""
-        
-        # Retry logic for LLM calls
-        max_retries = 3
-        retry_delay = 1
+    
+    return {
+        "docs": docs,
+        "best_doc": best_doc,
+        "best_score": best_score,
+        "keyword_hits": keyword_hits,
+        # Cosine Similarity Only for Confidence
+        "confidence": round(best_score * 100, 1),
+        "messages": build_analysis_messages(obligation, docs),
+    }
+
+def normalize_verdict(parsed):
+    """
+    Turn a parsed JSON verdict into (status, reason, suggestion, cot_steps).
+
+    Accepts both the legacy shape ("is_present": "Yes"/"No") and the
+    structured one ("verdict": "Y"/"N" plus step codes "s1".."s7").
+    """
+    llm_status = str(parsed.get("is_present", parsed.get("verdict", "No"))).strip()
+    
+    # Normalize to Title Case (Yes/No)
+    if llm_status.lower() in ("yes", "y"):
+        llm_status = "Yes"
+    elif llm_status.lower() in ("no", "n"):
+        llm_status = "No"
+    
+    # Enforce strict Yes/No
+    if llm_status not in ["Yes", "No"]:
+        llm_status = "No"
         
-        for attempt in range(max_retries):
-            try:
-                resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a meticulous contract compliance expert. Think step-by-step before answering."},
-                        {"role": "user", "content": cot_prompt}
-                    ],
-                    temperature=0.0,  # Deterministic reasoning
-                    seed=42,      # Fixed seed for reproducibility
-                    max_tokens=800
-                )
-                res_text = resp.choices[0].message.content.strip()
-                logger.info(f"LLM analysis completed for '{obligation[:50]}...' (attempt {attempt + 1})")
-                logger.debug(f"LLM Response: {res_text}")
-                break
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    logger.warning(f"LLM call failed (attempt {attempt + 1}/{max_retries}): {e}. Retrying in {retry_delay}s...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    logger.error(f"LLM call failed after {max_retries} attempts: {e}")
-                    raise
+    llm_reason = (parsed.get("reason") or "").strip()
+    llm_suggestion = parsed.get("suggestion", None)
+    
+    # Fix suggestion logic: null/None for Yes, actual suggestion for No
+    if llm_status == "Yes":
+        llm_suggestion = None
+    elif not llm_suggestion or llm_suggestion == "null":
+        llm_suggestion = "Consider adding explicit language to address this obligation."
+    
+    if "s1" in parsed:
+        cot_steps = steps_from_codes(parsed, llm_reason)
+    else:
+        # Create fallback steps for backward compatibility
+        cot_steps = create_fallback_steps(llm_status, llm_reason)
+    
+    return llm_status, llm_reason, llm_suggestion, cot_steps
 
+# Reason of the verdict returned when the model's answer is missing or unreadable
+PARSE_FAILURE_REASON = "Reason could not be parsed from model response."
+
+def parse_analysis_response(obligation, res_text):
+    """
+    Parse the model's answer into a verdict.
+
+    Args:
+        res_text: Raw completion text, or None if the LLM call failed
+
+    Returns:
+        Tuple of (status, reason, suggestion, cot_steps)
+    """
+    try:
+        if res_text is None:
+            raise ValueError("LLM call failed")
         
-        # Extract JSON from response
-        if "```json" in res_text:
+        # Extract JSON from response (structured output is plain JSON)
+        if STRUCTURED_OUTPUT:
+            json_text = res_text
+        elif "```json" in res_text:
             json_text = res_text.split("```json")[1].split("```")[0]
         elif "```" in res_text:
             json_text = res_text.split("```")[1]
         else:
             json_text = res_text
             
-        parsed = json.loads(json_text)
-        llm_status = parsed.get("is_present", "No").strip()
-        
-        # Normalize to Title Case (Yes/No)
-        if llm_status.lower() == "yes":
-            llm_status = "Yes"
-        elif llm_status.lower() == "no":
-            llm_status = "No"
-        
-        # Enforce strict Yes/No
-        if llm_status not in ["Yes", "No"]:
-            llm_status = "No"
-            
-        llm_reason = parsed.get("reason", "").strip()
-        llm_suggestion = parsed.get("suggestion", None)
-        
-        # Fix suggestion logic: null/None for Yes, actual suggestion for No
-        if llm_status == "Yes":
-            llm_suggestion = None
-        elif not llm_suggestion or llm_suggestion == "null":
-            llm_suggestion = "Consider adding explicit language to address this obligation."
-        
-        # Create fallback steps for backward compatibility
-        cot_steps = create_fallback_steps(llm_status, llm_reason)
+        return normalize_verdict(json.loads(json_text))
             
     except Exception as e:
         logger.error(f"Error parsing LLM response for '{obligation[:50]}...': {e}")
-        llm_reason = "Reason could not be parsed from model response."
+        llm_reason = PARSE_FAILURE_REASON
         llm_suggestion = "Could not generate suggestion due to error."
-        cot_steps = create_fallback_steps("No", llm_reason)
+        return "No", llm_reason, llm_suggestion, create_fallback_steps("No", llm_reason)
+
+def group_obligations_by_clauses(contexts, max_size=None, min_overlap=None):
+    """
+    Group obligations whose retrieved clauses overlap, for packed analysis.
+
+    Greedy: each obligation joins the open group that already contains the
+    largest share of its clauses, if that share is at least min_overlap.
+
+    Args:
+        contexts: Dict mapping obligation index to its prepare_rag_context dict
+
+    Returns:
+        List of groups, each a list of obligation indices
+    """
+    max_size = max_size or PACK_MAX_OBLIGATIONS
+    min_overlap = PACK_MIN_OVERLAP if min_overlap is None else min_overlap
+    groups = []
+    for index, context in contexts.items():
+        clauses = {d.page_content for d in context["docs"]}
+        best_group, best_overlap = None, 0.0
+        for group in groups:
+            if len(group["members"]) >= max_size:
+                continue
+            overlap = len(clauses & group["clauses"]) / max(1, len(clauses))
+            if overlap >= min_overlap and overlap > best_overlap:
+                best_group, best_overlap = group, overlap
+        if best_group is None:
+            groups.append({"members": [index], "clauses": set(clauses)})
+        else:
+            best_group["members"].append(index)
+            best_group["clauses"] |= clauses
+    return [group["members"] for group in groups]
+
+def packed_request_kwargs(messages, n_obligations):
+    """Keyword arguments for a packed analysis chat completion."""
+    return dict(
+        model=ANALYSIS_MODEL,
+        messages=messages,
+        temperature=0.0,
+        seed=42,
+        max_tokens=min((STRUCTURED_MAX_TOKENS if STRUCTURED_OUTPUT else 800) * n_obligations, 4000),
+        response_format=PACKED_RESPONSE_FORMAT if STRUCTURED_OUTPUT else {"type": "json_object"}
+    )
+
+def parse_packed_response(n_obligations, res_text):
+    """
+    Parse a packed answer.
+
+    Returns:
+        List with one verdict tuple per obligation, or None where the model
+        did not return a usable verdict
+    """
+    verdicts = [None] * n_obligations
+    try:
+        for item in json.loads(res_text).get("verdicts", []):
+            ob_id = str(item.get("obligation_id", "")).upper().lstrip("O")
+            if ob_id.isdigit() and 1 <= int(ob_id) <= n_obligations and ("is_present" in item or "verdict" in item):
+                verdicts[int(ob_id) - 1] = normalize_verdict(item)
+    except Exception as e:
+        logger.error(f"Error parsing packed LLM response: {e}")
+    return verdicts
+
+async def decide_packed_async(obligations, contexts, semaphore=None):
+    """
+    Analyse several obligations with a single LLM call.
+
+    Returns:
+        List with one verdict tuple (or None if missing) per obligation;
+        callers fall back to single-obligation analysis for the gaps
+    """
+    request = packed_request_kwargs(build_packed_messages(obligations, contexts), len(obligations))
+    retry_delay = 1
+    for attempt in range(LLM_MAX_RETRIES):
+        try:
+            if semaphore is not None:
+                async with semaphore:
+                    resp = await chat_completion_async(stage="packed_analysis", usage_keys=list(obligations), **request)
+            else:
+                resp = await chat_completion_async(stage="packed_analysis", usage_keys=list(obligations), **request)
+            logger.info(f"Packed LLM analysis completed for {len(obligations)} obligations (attempt {attempt + 1})")
+            return parse_packed_response(len(obligations), resp.choices[0].message.content)
+        except Exception as e:
+            if attempt < LLM_MAX_RETRIES - 1 and is_rate_limit(e):
+                # The scheduler already paused admission for this model
+                logger.warning(f"Rate limited (attempt {attempt + 1}/{LLM_MAX_RETRIES}); retrying after the scheduler's backoff")
+            elif attempt < LLM_MAX_RETRIES - 1:
+                logger.warning(f"Packed LLM call failed (attempt {attempt + 1}/{LLM_MAX_RETRIES}): {e}. Retrying in {retry_delay}s...")
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2  # Exponential backoff
+            else:
+                logger.error(f"Packed LLM call failed after {LLM_MAX_RETRIES} attempts: {e}")
+    return [None] * len(obligations)
+
+def normalize_obligation(obligation):
+    """Case- and whitespace-insensitive form used to spot duplicate obligations."""
+    return " ".join(obligation.split()).casefold()
+
+def hash_clauses(docs):
+    """Hash of the exact retrieved chunk texts, in the order they enter the prompt."""
+    digest = hashlib.sha256()
+    for d in docs:
+        digest.update(hashlib.sha256(d.page_content.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+def decision_key(obligation, docs):
+    """
+    Identity of an LLM decision: normalized obligation, the retrieved
+    chunks, prompt version and model.
+    """
+    combined = "|".join([normalize_obligation(obligation), hash_clauses(docs), PROMPT_VERSION, ANALYSIS_MODEL])
+    return hashlib.sha256(combined.encode("utf-8")).hexdigest()
+
+def context_vectors(obligation, docs):
+    """
+    Unit vectors describing a decision for the semantic cache: the
+    obligation embedding and the mean of its retrieved chunk embeddings
+    (both normally served from the embedding cache).
+    """
+    vectors = np.asarray(
+        get_embedder().embed_documents([obligation] + [d.page_content for d in docs]), dtype=np.float32
+    )
+    return _unit_rows(vectors[:1])[0], _unit_rows(vectors[1:].mean(axis=0, keepdims=True))[0]
+
+def build_rag_result(obligation, context, verdict):
+    """Assemble the result dict returned for one obligation."""
+    docs = context["docs"]
+    best_doc = context["best_doc"]
+    best_score = context["best_score"]
+    llm_status, llm_reason, llm_suggestion, cot_steps = verdict
     
     # Final Status based on LLM (Semantic Analysis)
     final_status = llm_status
@@ -595,14 +1299,97 @@ After completing these steps, provide your final JSON answer.
     
     return {
         "obligation": obligation, "is_present": final_status, "reason": llm_reason,
-        "similarity_score": round(best_score, 3), "keyword_hits": keyword_hits,
-        "confidence": confidence, "page": best_doc.metadata.get("page"), "line": best_doc.metadata.get("line"),
+        "similarity_score": round(best_score, 3), "keyword_hits": context["keyword_hits"],
+        "confidence": context["confidence"], "page": best_doc.metadata.get("page"), "line": best_doc.metadata.get("line"),
         "supporting_clauses": supporting_clauses,
         "supporting_clauses_original": supporting_clauses_original,  # NEW: Original language for PDF highlighting
         "suggestion": llm_suggestion,
         "cot_steps": cot_steps  # NEW: Step-by-step validation results
     }
 
+def query_rag(vs, obligation, auto_keywords, top_k=10, hits=None):
+    # hits: precomputed (Document, similarity) tuples from batch_retrieve
+    context = prepare_rag_context(vs, obligation, auto_keywords, top_k, hits)
+    if context is None:
+        return no_clauses_result(obligation)
+    return build_rag_result(obligation, context, decide(obligation, context))
+
+def decide(obligation, context):
+    """
+    LLM decision stage of query_rag.
+
+    Returns:
+        Verdict tuple (status, reason, suggestion, cot_steps)
+    """
+    # Retry logic for LLM calls
+    res_text = None
+    retry_delay = 1
+    for attempt in range(LLM_MAX_RETRIES):
+        try:
+            resp = chat_completion(stage="analysis", usage_keys=[obligation], **analysis_request_kwargs(context["messages"]))
+            res_text = resp.choices[0].message.content.strip()
+            logger.info(f"LLM analysis completed for '{obligation[:50]}...' (attempt {attempt + 1})")
+            logger.debug(f"LLM Response: {res_text}")
+            break
+        except Exception as e:
+            if attempt < LLM_MAX_RETRIES - 1 and is_rate_limit(e):
+                # The scheduler already paused admission for this model
+                logger.warning(f"Rate limited (attempt {attempt + 1}/{LLM_MAX_RETRIES}); retrying after the scheduler's backoff")
+            elif attempt < LLM_MAX_RETRIES - 1:
+                logger.warning(f"LLM call failed (attempt {attempt + 1}/{LLM_MAX_RETRIES}): {e}. Retrying in {retry_delay}s...")
+                time.sleep(retry_delay)
+                retry_delay *= 2  # Exponential backoff
+            else:
+                logger.error(f"LLM call failed after {LLM_MAX_RETRIES} attempts: {e}")
+    
+    return parse_analysis_response(obligation, res_text)
+
+async def query_rag_async(vs, obligation, auto_keywords, top_k=10, hits=None, semaphore=None):
+    """
+    Async variant of query_rag built on AsyncOpenAI.
+
+    Retrieval runs on the analysis worker pool only when hits are not
+    precomputed; the LLM call and retry backoff never block the event loop.
+
+    Args:
+        semaphore: Optional asyncio.Semaphore bounding in-flight LLM calls
+    """
+    if hits is None:
+        context = await run_blocking(prepare_rag_context, vs, obligation, auto_keywords, top_k)
+    else:
+        context = prepare_rag_context(vs, obligation, auto_keywords, top_k, hits)
+    if context is None:
+        return no_clauses_result(obligation)
+    return build_rag_result(obligation, context, await decide_async(obligation, context, semaphore))
+
+async def decide_async(obligation, context, semaphore=None):
+    """Async variant of decide; backoff never blocks the event loop."""
+    res_text = None
+    retry_delay = 1
+    for attempt in range(LLM_MAX_RETRIES):
+        try:
+            if semaphore is not None:
+                async with semaphore:
+                    resp = await chat_completion_async(stage="analysis", usage_keys=[obligation], **analysis_request_kwargs(context["messages"]))
+            else:
+                resp = await chat_completion_async(stage="analysis", usage_keys=[obligation], **analysis_request_kwargs(context["messages"]))
+            res_text = resp.choices[0].message.content.strip()
+            logger.info(f"LLM analysis completed for '{obligation[:50]}...' (attempt {attempt + 1})")
+            logger.debug(f"LLM Response: {res_text}")
+            break
+        except Exception as e:
+            if attempt < LLM_MAX_RETRIES - 1 and is_rate_limit(e):
+                # The scheduler already paused admission for this model
+                logger.warning(f"Rate limited (attempt {attempt + 1}/{LLM_MAX_RETRIES}); retrying after the scheduler's backoff")
+            elif attempt < LLM_MAX_RETRIES - 1:
+                logger.warning(f"LLM call failed (attempt {attempt + 1}/{LLM_MAX_RETRIES}): {e}. Retrying in {retry_delay}s...")
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2  # Exponential backoff
+            else:
+                logger.error(f"LLM call failed after {LLM_MAX_RETRIES} attempts: {e}")
+    
+    return parse_analysis_response(obligation, res_text)
+
 def analyze_contract(obligations_file_bytes, obligations_filename, contract_file_bytes, contract_filename, session_id):
     # 1. Load Obligations
     import io
@@ -619,42 +1406,35 @@ def analyze_contract(obligations_file_bytes, obligations_filename, contract_file
     df_ob = df_ob[df_ob["Obligation_English"].str.strip() != ""].reset_index(drop=True)
     obligations = df_ob["Obligation_English"].tolist()
     
-    # 2. Extract Contract Text
-    if contract_filename.endswith(".pdf"):
-        records = extract_text_from_pdf(contract_file_bytes)
-    elif contract_filename.endswith(".docx"):
-        records = extract_text_from_docx(contract_file_bytes)
-    elif contract_filename.endswith(".xlsx"):
-        records = extract_text_from_excel(contract_file_bytes)
-    else:
-        records = extract_text_from_txt(contract_file_bytes)
+    # Generate keywords while the contract is ingested
+    with ThreadPoolExecutor(max_workers=1) as keyword_executor:
+        keywords_future = keyword_executor.submit(contextvars.copy_context().run, generate_dynamic_keywords, obligations)
         
-    # MULTILINGUAL FIX: Preserve original text before translation
-    # Store both original and translated text for dual-track processing
-    for rec in records:
-        rec["text_original"] = rec["text"]  # Preserve original
-        rec["text_translated"] = translate_to_english(rec["text"]).strip()  # Translate for analysis
-        rec["text"] = rec["text_translated"]  # Backward compatibility
+        # 2. Extract Contract Text
+        if contract_filename.endswith(".pdf"):
+            records = extract_text_from_pdf(contract_file_bytes)
+        elif contract_filename.endswith(".docx"):
+            records = extract_text_from_docx(contract_file_bytes)
+        elif contract_filename.endswith(".xlsx"):
+            records = extract_text_from_excel(contract_file_bytes)
+        else:
+            records = extract_text_from_txt(contract_file_bytes)
+            
+        # Key the vector store on the extracted (untranslated) text
+        vector_key = get_contract_vector_key(records)
+            
+        # 3. Load or Build Vector Store (reused across sessions for the same contract).
+        # MULTILINGUAL FIX: new contracts keep both original and translated
+        # text for dual-track processing; stored ones come back translated
+        vs, records = load_or_build_vector_store(records, vector_key)
         
-    # 3. Build Vector Store
-    docs = chunk_text(records)
-    vector_path = get_user_vector_path(session_id)
-    vs = build_vector_store(docs, vector_path)
-    
-    # 4. Generate Keywords
-    auto_keywords = generate_dynamic_keywords(obligations)
+        # 4. Wait for the keywords
+        auto_keywords = keywords_future.result()
     
     # 5. Run Analysis
     results = []
     for ob in obligations:
         results.append(query_rag(vs, ob, auto_keywords))
-        
-    # Cleanup vector store to prevent disk bloat
-    try:
-        shutil.rmtree(vector_path)
-        logger.info(f"Cleaned up vector store: {vector_path}")
-    except Exception as e:
-        logger.warning(f"Failed to cleanup vector store {vector_path}: {e}")
     
     # 6. Prepare Full Text for Preview Fallback
     full_text = "\n\n".join([r["text_translated"] for r in records])
@@ -3,27 +3,53 @@ Enhanced core functions with caching, batch processing, and configurable embeddi
 This module extends core.py without modifying it.
 """
 import os
+import asyncio
+import contextvars
 import logging
 import threading
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
 
 # Import from core
 from backend.core import (
-    query_rag, generate_dynamic_keywords, chunk_text, 
-    build_vector_store, translate_to_english
+    generate_dynamic_keywords, translate_to_english, batch_retrieve,
+    prepare_rag_context, build_rag_result, no_clauses_result, decide, decide_async,
+    group_obligations_by_clauses, decide_packed_async, PACKED_DECISIONS,
+    normalize_obligation, hash_clauses, decision_key, context_vectors, PARSE_FAILURE_REASON,
+    PROMPT_VERSION, ANALYSIS_MODEL
 )
-from backend.cache import get_cache, hash_contract
+from backend.cache import get_cache
+from backend.embedding_cache import CachedEmbeddings
+from backend.workers import run_blocking, run_cache_io
+from backend.scheduler import get_scheduler, ScheduledEmbeddings
+from backend.singleflight import get_single_flight
+from backend.semantic_cache import get_semantic_cache, USE_SEMANTIC_CACHE
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 # Configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-USE_CACHE = False # os.getenv("USE_CACHE", "true").lower() == "true"
+USE_CACHE = os.getenv("USE_CACHE", "true").lower() == "true"
+# Cached verdicts are only reused for the prompt and model that produced them
+CACHE_VERSION = f"{PROMPT_VERSION}:{ANALYSIS_MODEL}"
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "5"))
+# Maximum in-flight LLM calls across all requests on the async path
+ASYNC_LLM_CONCURRENCY = int(os.getenv("ASYNC_LLM_CONCURRENCY", "50"))
+
+# Process-wide semaphore for the async path (bound to the running event loop)
+_llm_semaphore = None
+_llm_semaphore_loop = None
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore bounding in-flight async LLM calls."""
+    global _llm_semaphore, _llm_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _llm_semaphore is None or _llm_semaphore_loop is not loop:
+        _llm_semaphore = asyncio.Semaphore(ASYNC_LLM_CONCURRENCY)
+        _llm_semaphore_loop = loop
+    return _llm_semaphore
 
 # Enhanced embedder (can use text-embedding-3-large for legal domain)
 enhanced_embedder = None
@@ -36,46 +62,243 @@ def get_enhanced_embedder():
         with _embedder_lock:
             # Double-check locking pattern
             if enhanced_embedder is None:
-                enhanced_embedder = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+                from langchain_openai import OpenAIEmbeddings
+                # No SDK retries: the rate-limit scheduler owns 429 backoff
+                enhanced_embedder = CachedEmbeddings(
+                    ScheduledEmbeddings(
+                        OpenAIEmbeddings(model=EMBEDDING_MODEL, max_retries=0), get_scheduler(EMBEDDING_MODEL)
+                    ),
+                    EMBEDDING_MODEL
+                )
                 logger.info(f"Initialized embedder with model: {EMBEDDING_MODEL}")
     return enhanced_embedder
 
-def query_rag_with_cache(vs, obligation: str, auto_keywords: Dict, contract_hash: str, top_k: int = 6) -> Dict[str, Any]:
+def dedupe_obligations(obligations: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    Collapse duplicate and near-verbatim obligation rows.
+    
+    Returns:
+        Tuple of (unique obligations, index into them for every input row)
+    """
+    unique: List[str] = []
+    positions: Dict[str, int] = {}
+    row_map = []
+    for ob in obligations:
+        norm = normalize_obligation(ob)
+        if norm not in positions:
+            positions[norm] = len(unique)
+            unique.append(ob)
+        row_map.append(positions[norm])
+    if len(unique) < len(obligations):
+        logger.info(f"Analyzing {len(unique)} unique obligations for {len(obligations)} rows")
+    return unique, row_map
+
+def result_for_row(result: Dict[str, Any], obligation: str) -> Dict[str, Any]:
+    """Copy of a shared result labelled with the row's own obligation text."""
+    return {**result, "obligation": obligation}
+
+def verdict_from_dict(cached: Dict[str, Any]) -> Tuple:
+    return cached["is_present"], cached["reason"], cached["suggestion"], cached["cot_steps"]
+
+def cached_verdict(obligation: str, context: Dict[str, Any]) -> Optional[Tuple[Tuple, Dict[str, Any]]]:
+    """
+    Look up a prior verdict for the obligation and the exact retrieved clauses,
+    then (when enabled) for a semantically near-identical pair.
+    
+    The clause-level key lets the same standard clauses reuse verdicts across
+    contracts; the result itself is always rebuilt from the current context.
+    
+    Returns:
+        Tuple of (verdict, cache audit dict) or None on a miss
+    """
+    if USE_CACHE:
+        cached = get_cache().get(normalize_obligation(obligation), hash_clauses(context["docs"]), CACHE_VERSION)
+        if cached:
+            return verdict_from_dict(cached), {"source": "cache"}
+    if USE_SEMANTIC_CACHE:
+        ob_vec, ctx_vec = context_vectors(obligation, context["docs"])
+        context["vectors"] = (ob_vec, ctx_vec)
+        hit = get_semantic_cache().lookup(CACHE_VERSION, ob_vec, ctx_vec)
+        if hit is not None:
+            cached, audit = hit
+            logger.info(f"Semantic cache HIT for '{obligation[:50]}...' (matched '{audit['matched_obligation'][:50]}...')")
+            return verdict_from_dict(cached), {"source": "semantic_cache", **audit}
+    return None
+
+def store_verdict(obligation: str, context: Dict[str, Any], verdict: Tuple) -> None:
+    """Cache a verdict unless it records a failed or unreadable LLM answer."""
+    status, reason, suggestion, cot_steps = verdict
+    if reason == PARSE_FAILURE_REASON:
+        return
+    value = {"is_present": status, "reason": reason, "suggestion": suggestion, "cot_steps": cot_steps}
+    if USE_CACHE:
+        get_cache().set(normalize_obligation(obligation), hash_clauses(context["docs"]), value, CACHE_VERSION)
+    if USE_SEMANTIC_CACHE:
+        try:
+            ob_vec, ctx_vec = context.get("vectors") or context_vectors(obligation, context["docs"])
+            get_semantic_cache().add(CACHE_VERSION, obligation, ob_vec, ctx_vec, value)
+        except Exception as e:
+            logger.warning(f"Failed to update semantic cache: {e}")
+
+def with_audit(result: Dict[str, Any], audit: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach where the verdict came from (LLM, exact cache or semantic cache)."""
+    result["cache_audit"] = audit
+    return result
+
+def decide_with_cache(obligation: str, context: Dict[str, Any]) -> Tuple[Tuple, Dict[str, Any]]:
+    """
+    Verdict from the cache, a matching in-flight call, or a new LLM call.
+    
+    Returns:
+        Tuple of (verdict, cache audit dict)
+    """
+    hit = cached_verdict(obligation, context)
+    if hit is not None:
+        return hit
+    
+    def analyze() -> Tuple:
+        new_verdict = decide(obligation, context)
+        store_verdict(obligation, context, new_verdict)
+        return new_verdict
+    
+    # Identical requests in flight (other sessions included) share one LLM call
+    return get_single_flight().do(decision_key(obligation, context["docs"]), analyze), {"source": "llm"}
+
+async def decide_with_cache_async(
+    obligation: str,
+    context: Dict[str, Any],
+    semaphore: asyncio.Semaphore = None,
+    check_cache: bool = True
+) -> Tuple[Tuple, Dict[str, Any]]:
+    """Async variant of decide_with_cache."""
+    if check_cache:
+        # Cache lookups read SQLite (and may embed text), so keep them off the event loop
+        hit = await run_cache_io(cached_verdict, obligation, context)
+        if hit is not None:
+            return hit
+    
+    async def analyze() -> Tuple:
+        new_verdict = await decide_async(obligation, context, semaphore)
+        await run_cache_io(store_verdict, obligation, context, new_verdict)
+        return new_verdict
+    
+    verdict = await get_single_flight().do_async(decision_key(obligation, context["docs"]), analyze)
+    return verdict, {"source": "llm"}
+
+def query_rag_with_cache(vs, obligation: str, auto_keywords: Dict, top_k: int = 6, hits: List = None) -> Dict[str, Any]:
     """
     Query RAG with caching support.
     
+    Retrieval always runs; the cache is consulted afterwards, keyed on the
+    obligation and the clauses that would go into the prompt.
+    
     Args:
         vs: Vector store
         obligation: Obligation text
         auto_keywords: Keywords dictionary
-        contract_hash: Hash of contract content
         top_k: Number of chunks to retrieve
+        hits: Precomputed retrieval hits from batch_retrieve (optional)
         
     Returns:
         Analysis result
     """
-    cache = get_cache()
+    if hits is None:
+        hits = batch_retrieve(vs, [obligation], top_k).get(obligation, [])
+    context = prepare_rag_context(vs, obligation, auto_keywords, top_k, hits)
+    if context is None:
+        return no_clauses_result(obligation)
+    verdict, audit = decide_with_cache(obligation, context)
+    return with_audit(build_rag_result(obligation, context, verdict), audit)
+
+async def query_rag_with_cache_async(vs, obligation: str, auto_keywords: Dict, top_k: int = 6, hits: List = None, semaphore: asyncio.Semaphore = None) -> Dict[str, Any]:
+    """
+    Async variant of query_rag_with_cache.
     
-    # Check cache if enabled
-    if USE_CACHE:
-        cached_result = cache.get(obligation, contract_hash)
-        if cached_result:
-            return cached_result
+    Args:
+        semaphore: Semaphore bounding in-flight LLM calls
+        
+    Returns:
+        Analysis result
+    """
+    if hits is None:
+        hits = (await run_blocking(batch_retrieve, vs, [obligation], top_k)).get(obligation, [])
+    context = prepare_rag_context(vs, obligation, auto_keywords, top_k, hits)
+    if context is None:
+        return no_clauses_result(obligation)
+    verdict, audit = await decide_with_cache_async(obligation, context, semaphore)
+    return with_audit(build_rag_result(obligation, context, verdict), audit)
+
+async def analyze_packed_group_async(
+    vs,
+    group: List[str],
+    auto_keywords: Dict,
+    top_k: int,
+    retrieval_hits: Dict,
+    semaphore: asyncio.Semaphore
+) -> List[Dict[str, Any]]:
+    """
+    Analyze a group of obligations with overlapping clauses in one LLM call.
     
-    # Perform analysis
-    result = query_rag(vs, obligation, auto_keywords, top_k)
+    Cached obligations are served from the cache, and any obligation the
+    packed answer does not cover falls back to a single-obligation call.
     
-    # Store in cache if enabled
-    if USE_CACHE:
-        cache.set(obligation, contract_hash, result)
+    Returns:
+        List of analysis results in same order as group
+    """
+    contexts = {i: prepare_rag_context(vs, ob, auto_keywords, top_k, retrieval_hits.get(ob)) for i, ob in enumerate(group)}
+    verdicts: Dict[int, Tuple[Tuple, Dict[str, Any]]] = {}
+    for i, ob in enumerate(group):
+        hit = await run_cache_io(cached_verdict, ob, contexts[i])
+        if hit is not None:
+            verdicts[i] = hit
+    pending = [i for i in range(len(group)) if i not in verdicts]
     
-    return result
+    packed = [None] * len(pending)
+    if len(pending) > 1:
+        packed = await decide_packed_async(
+            [group[i] for i in pending], [contexts[i] for i in pending], semaphore
+        )
+    
+    for i, verdict in zip(pending, packed):
+        if verdict is None:
+            verdicts[i] = await decide_with_cache_async(group[i], contexts[i], semaphore, check_cache=False)
+        else:
+            await run_cache_io(store_verdict, group[i], contexts[i], verdict)
+            verdicts[i] = verdict, {"source": "llm"}
+    
+    return [
+        with_audit(build_rag_result(ob, contexts[i], verdicts[i][0]), verdicts[i][1])
+        for i, ob in enumerate(group)
+    ]
+
+def report_progress(progress: Optional[Callable], stage: str, completed: int = None, total: int = None) -> None:
+    """Forward a stage update to an optional progress callback."""
+    if progress is None:
+        return
+    try:
+        progress(stage, completed, total)
+    except Exception as e:
+        logger.warning(f"Progress callback failed: {e}")
+
+def error_result(obligation: str, error: Exception) -> Dict[str, Any]:
+    """Result returned for an obligation whose analysis raised."""
+    return {
+        "obligation": obligation,
+        "is_present": "No",
+        "reason": f"Error during analysis: {str(error)}",
+        "confidence": 0.0,
+        "similarity_score": 0.0,
+        "keyword_hits": [],
+        "page": None,
+        "line": None,
+        "supporting_clauses": [],
+        "suggestion": "Unable to analyze due to error."
+    }
 
 def batch_analyze_obligations(
     vs, 
     obligations: List[str], 
     auto_keywords: Dict, 
-    contract_hash: str,
     top_k: int = 6,
     max_workers: int = None
 ) -> List[Dict[str, Any]]:
@@ -86,7 +309,6 @@ def batch_analyze_obligations(
         vs: Vector store
         obligations: List of obligation texts
         auto_keywords: Keywords dictionary
-        contract_hash: Hash of contract content
         top_k: Number of chunks to retrieve
         max_workers: Number of parallel workers (default: BATCH_SIZE)
         
@@ -96,20 +318,26 @@ def batch_analyze_obligations(
     if max_workers is None:
         max_workers = BATCH_SIZE
     
-    results = [None] * len(obligations)
+    # Duplicate rows are analyzed once and fanned out afterwards
+    unique, row_map = dedupe_obligations(obligations)
+    results = [None] * len(unique)
+    
+    # Retrieve for all obligations with one embedding batch and one search
+    retrieval_hits = batch_retrieve(vs, unique, top_k)
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
+        # Submit all tasks (each with a copy of the context, for the usage ledger)
         future_to_index = {
             executor.submit(
+                contextvars.copy_context().run,
                 query_rag_with_cache, 
                 vs, 
                 ob, 
                 auto_keywords, 
-                contract_hash, 
-                top_k
+                top_k,
+                retrieval_hits.get(ob)
             ): i
-            for i, ob in enumerate(obligations)
+            for i, ob in enumerate(unique)
         }
         
         # Collect results as they complete
@@ -118,54 +346,138 @@ def batch_analyze_obligations(
             try:
                 result = future.result()
                 results[index] = result
-                logger.info(f"Completed analysis for obligation {index + 1}/{len(obligations)}")
+                logger.info(f"Completed analysis for obligation {index + 1}/{len(unique)}")
             except Exception as e:
                 logger.error(f"Error analyzing obligation {index + 1}: {e}")
-                results[index] = {
-                    "obligation": obligations[index],
-                    "is_present": "No",
-                    "reason": f"Error during analysis: {str(e)}",
-                    "confidence": 0.0,
-                    "similarity_score": 0.0,
-                    "keyword_hits": [],
-                    "page": None,
-                    "line": None,
-                    "supporting_clauses": [],
-                    "suggestion": "Unable to analyze due to error."
-                }
+                results[index] = error_result(unique[index], e)
+    
+    return [result_for_row(results[j], ob) for ob, j in zip(obligations, row_map)]
+
+async def batch_analyze_obligations_async(
+    vs, 
+    obligations: List[str], 
+    auto_keywords: Dict, 
+    top_k: int = 6,
+    semaphore: asyncio.Semaphore = None,
+    progress: Optional[Callable] = None,
+    on_result: Optional[Callable] = None
+) -> List[Dict[str, Any]]:
+    """
+    Analyze multiple obligations concurrently on the event loop.
+    
+    Args:
+        vs: Vector store
+        obligations: List of obligation texts
+        auto_keywords: Keywords dictionary
+        top_k: Number of chunks to retrieve
+        semaphore: Bounds in-flight LLM calls (default: process-wide semaphore)
+        progress: Optional callback(stage, completed, total)
+        on_result: Optional callback(index, result) invoked as soon as each
+            obligation finishes, for streaming results to clients
+        
+    When PACKED_DECISIONS is enabled, obligations whose retrieved clauses
+    overlap are analyzed together in one LLM call.
+        
+    Returns:
+        List of analysis results in same order as obligations
+    """
+    if semaphore is None:
+        semaphore = get_llm_semaphore()
     
+    # Duplicate rows are analyzed once; every row gets the shared result
+    unique, row_map = dedupe_obligations(obligations)
+    rows_of: Dict[int, List[int]] = {}
+    for row, j in enumerate(row_map):
+        rows_of.setdefault(j, []).append(row)
+    
+    # Retrieve for all obligations with one embedding batch and one search
+    retrieval_hits = await run_blocking(batch_retrieve, vs, unique, top_k)
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(obligations)
+    completed = 0
+    report_progress(progress, "analyzing", completed, len(obligations))
+    
+    def finish(unique_index: int, result: Dict[str, Any]) -> None:
+        nonlocal completed
+        for index in rows_of[unique_index]:
+            results[index] = result_for_row(result, obligations[index])
+            completed += 1
+            logger.info(f"Completed analysis for obligation {index + 1}/{len(obligations)}")
+            if on_result is not None:
+                try:
+                    on_result(index, results[index])
+                except Exception as e:
+                    logger.warning(f"Result callback failed: {e}")
+        report_progress(progress, "analyzing", completed, len(obligations))
+    
+    async def analyze_one(index: int, ob: str) -> None:
+        try:
+            result = await query_rag_with_cache_async(
+                vs, ob, auto_keywords, top_k, retrieval_hits.get(ob), semaphore
+            )
+        except Exception as e:
+            logger.error(f"Error analyzing obligation {index + 1}: {e}")
+            result = error_result(ob, e)
+        finish(index, result)
+    
+    async def analyze_group(indices: List[int]) -> None:
+        group = [unique[i] for i in indices]
+        try:
+            group_results = await analyze_packed_group_async(
+                vs, group, auto_keywords, top_k, retrieval_hits, semaphore
+            )
+        except Exception as e:
+            logger.error(f"Error analyzing packed group {[i + 1 for i in indices]}: {e}")
+            group_results = [error_result(ob, e) for ob in group]
+        for index, result in zip(indices, group_results):
+            finish(index, result)
+    
+    units = [[i] for i in range(len(unique))]
+    if PACKED_DECISIONS:
+        contexts = {}
+        for i, ob in enumerate(unique):
+            context = prepare_rag_context(vs, ob, auto_keywords, top_k, retrieval_hits.get(ob))
+            if context is not None:
+                contexts[i] = context
+        units = group_obligations_by_clauses(contexts) + [[i] for i in range(len(unique)) if i not in contexts]
+        logger.info(f"Packed {len(unique)} obligations into {len(units)} LLM calls")
+    
+    await asyncio.gather(*(
+        analyze_one(unit[0], unique[unit[0]]) if len(unit) == 1 else analyze_group(unit)
+        for unit in units
+    ))
     return results
 
-def analyze_contract_enhanced(
+def prepare_contract_analysis(
     obligations_file_bytes, 
     obligations_filename, 
     contract_file_bytes, 
-    contract_filename, 
-    session_id,
-    use_batch: bool = True
+    contract_filename,
+    progress: Optional[Callable] = None
 ):
     """
-    Enhanced contract analysis with caching and batch processing.
+    Ingestion stage shared by the sync and async pipelines (blocking).
     
     Args:
         obligations_file_bytes: Bytes of obligations file
         obligations_filename: Name of obligations file
         contract_file_bytes: Bytes of contract file
         contract_filename: Name of contract file
-        session_id: Session identifier
-        use_batch: Whether to use batch processing
+        progress: Optional callback(stage, completed, total)
         
     Returns:
-        Tuple of (results, full_text, cache_stats)
+        Tuple of (obligations, vector_store, auto_keywords, full_text)
     """
     import pandas as pd
     import io
     from backend.core import (
         extract_text_from_pdf, extract_text_from_docx,
         extract_text_from_excel, extract_text_from_txt,
-        get_user_vector_path, detect_language
+        get_contract_vector_key, load_or_build_vector_store, detect_language
     )
     
+    report_progress(progress, "extracting")
+    
     # 1. Load Obligations
     if obligations_filename.endswith(".csv"):
         df_ob = pd.read_csv(io.BytesIO(obligations_file_bytes)).dropna(how="all")
@@ -178,46 +490,129 @@ def analyze_contract_enhanced(
     df_ob = df_ob[df_ob["Obligation_English"].str.strip() != ""].reset_index(drop=True)
     obligations = df_ob["Obligation_English"].tolist()
     
-    # 2. Extract Contract Text
-    if contract_filename.endswith(".pdf"):
-        records = extract_text_from_pdf(contract_file_bytes)
-    elif contract_filename.endswith(".docx"):
-        records = extract_text_from_docx(contract_file_bytes)
-    elif contract_filename.endswith(".xlsx"):
-        records = extract_text_from_excel(contract_file_bytes)
-    else:
-        records = extract_text_from_txt(contract_file_bytes)
-    
-    # MULTILINGUAL FIX: Preserve original text before translation
-    # Store both original and translated text for dual-track processing
-    for rec in records:
-        rec["text_original"] = rec["text"]  # Preserve original
-        rec["text_translated"] = translate_to_english(rec["text"]).strip()  # Translate for analysis
-        rec["text"] = rec["text_translated"]  # Backward compatibility
+    # Keywords only depend on the obligations: generate them while the
+    # contract is extracted, translated and embedded
+    with ThreadPoolExecutor(max_workers=1) as keyword_executor:
+        keywords_future = keyword_executor.submit(
+            contextvars.copy_context().run, generate_dynamic_keywords, obligations
+        )
+        
+        # 2. Extract Contract Text
+        if contract_filename.endswith(".pdf"):
+            records = extract_text_from_pdf(contract_file_bytes)
+        elif contract_filename.endswith(".docx"):
+            records = extract_text_from_docx(contract_file_bytes)
+        elif contract_filename.endswith(".xlsx"):
+            records = extract_text_from_excel(contract_file_bytes)
+        else:
+            records = extract_text_from_txt(contract_file_bytes)
+        
+        # Key the vector store on the extracted (untranslated) text
+        vector_key = get_contract_vector_key(records)
+        
+        # 3. Load the stored index and translated records, reused across
+        # sessions for the same contract, or ingest the contract.
+        # MULTILINGUAL FIX: new contracts keep both original and translated
+        # text for dual-track processing (English documents skip translation
+        # entirely); progress reports how many lines were sent for translation
+        vs, records = load_or_build_vector_store(
+            records, vector_key,
+            progress=lambda stage, completed, total: report_progress(progress, stage, completed, total)
+        )
+        
+        # 4. Wait for the keywords
+        report_progress(progress, "keywords")
+        auto_keywords = keywords_future.result()
     
-    # 3. Build Vector Store
-    docs = chunk_text(records)
-    vector_path = get_user_vector_path(session_id)
-    vs = build_vector_store(docs, vector_path)
+    # 5. Full text for the preview (the decision cache is keyed on clauses)
+    full_text = "\\n\\n".join([r["text_translated"] for r in records])
     
-    # 4. Generate Keywords
-    auto_keywords = generate_dynamic_keywords(obligations)
+    return obligations, vs, auto_keywords, full_text
+
+def analyze_contract_enhanced(
+    obligations_file_bytes, 
+    obligations_filename, 
+    contract_file_bytes, 
+    contract_filename, 
+    session_id,
+    use_batch: bool = True
+):
+    """
+    Enhanced contract analysis with caching and batch processing.
     
-    # 5. Generate contract hash for caching
-    full_text = "\\n\\n".join([r["text_translated"] for r in records])
-    contract_hash_val = hash_contract(full_text)
+    Args:
+        obligations_file_bytes: Bytes of obligations file
+        obligations_filename: Name of obligations file
+        contract_file_bytes: Bytes of contract file
+        contract_filename: Name of contract file
+        session_id: Session identifier
+        use_batch: Whether to use batch processing
+        
+    Returns:
+        Tuple of (results, full_text, cache_stats)
+    """
+    obligations, vs, auto_keywords, full_text = prepare_contract_analysis(
+        obligations_file_bytes, obligations_filename, contract_file_bytes, contract_filename
+    )
     
     # 6. Run Analysis (batch or sequential)
     if use_batch and len(obligations) > 1:
         logger.info(f"Using batch processing for {len(obligations)} obligations")
-        results = batch_analyze_obligations(vs, obligations, auto_keywords, contract_hash_val)
+        results = batch_analyze_obligations(vs, obligations, auto_keywords)
     else:
         logger.info(f"Using sequential processing for {len(obligations)} obligations")
-        results = []
-        for ob in obligations:
-            results.append(query_rag_with_cache(vs, ob, auto_keywords, contract_hash_val))
+        unique, row_map = dedupe_obligations(obligations)
+        retrieval_hits = batch_retrieve(vs, unique, top_k=6)
+        unique_results = [
+            query_rag_with_cache(vs, ob, auto_keywords, hits=retrieval_hits.get(ob))
+            for ob in unique
+        ]
+        results = [result_for_row(unique_results[j], ob) for ob, j in zip(obligations, row_map)]
     
     # 7. Get cache stats
     cache_stats = get_cache().get_stats() if USE_CACHE else None
     
     return results, full_text, cache_stats
+
+async def analyze_contract_enhanced_async(
+    obligations_file_bytes, 
+    obligations_filename, 
+    contract_file_bytes, 
+    contract_filename, 
+    session_id,
+    use_batch: bool = True,
+    progress: Optional[Callable] = None,
+    on_result: Optional[Callable] = None
+):
+    """
+    Asyncio-native contract analysis.
+    
+    Ingestion runs on the bounded analysis worker pool; obligation analysis
+    runs on the event loop through AsyncOpenAI, bounded by the process-wide
+    LLM semaphore.
+    
+    Args:
+        use_batch: Analyze obligations concurrently (False = one at a time)
+        progress: Optional callback(stage, completed, total) receiving
+            extracting/translating/embedding/keywords/analyzing updates
+        on_result: Optional callback(index, result) per finished obligation
+        
+    Returns:
+        Tuple of (results, full_text, cache_stats)
+    """
+    obligations, vs, auto_keywords, full_text = await run_blocking(
+        prepare_contract_analysis,
+        obligations_file_bytes, obligations_filename, contract_file_bytes, contract_filename,
+        progress
+    )
+    
+    semaphore = get_llm_semaphore() if use_batch else asyncio.Semaphore(1)
+    logger.info(f"Analyzing {len(obligations)} obligations (async, batch={use_batch})")
+    results = await batch_analyze_obligations_async(
+        vs, obligations, auto_keywords,
+        semaphore=semaphore, progress=progress, on_result=on_result
+    )
+    
+    cache_stats = get_cache().get_stats() if USE_CACHE else None
+    
+    return results, full_text, cache_stats
@@ -0,0 +1,243 @@
+"""
+Persistent embedding cache shared across sessions and worker processes.
+Vectors are content-addressed by (model name, text hash) and stored in an
+append-only float32 file that is read back through a memory map.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("user_memory", "embedding_cache"))
+USE_EMBEDDING_CACHE = os.getenv("USE_EMBEDDING_CACHE", "true").lower() == "true"
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+def hash_text(text: str) -> str:
+    """SHA256 of the exact text that is sent to the embedding model."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk vector store for a single embedding model."""
+
+    def __init__(self, model_name: str, root: str = EMBEDDING_CACHE_DIR):
+        """
+        Initialize cache.
+
+        Args:
+            model_name: Embedding model the vectors belong to
+            root: Directory holding one sub-directory per model
+        """
+        self.model_name = model_name
+        slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.directory = os.path.join(root, slug)
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, "index.sqlite")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.index_path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (text_hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._mmap: Optional[np.memmap] = None
+        self._hits = 0
+        self._misses = 0
+
+    def _dim(self) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def _rows(self, max_row: int, dim: int) -> np.ndarray:
+        """Memory map of the vector file, remapped when another writer grew it."""
+        if self._mmap is None or self._mmap.shape[0] <= max_row:
+            n_rows = os.path.getsize(self.vectors_path) // (dim * 4)
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, dim))
+        return self._mmap
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached vectors.
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            One vector (or None on a miss) per input text
+        """
+        hashes = [hash_text(t) for t in texts]
+        with self._lock:
+            dim = self._dim()
+            found: Dict[str, int] = {}
+            if dim is not None:
+                unique = list(set(hashes))
+                for i in range(0, len(unique), _SQL_BATCH):
+                    part = unique[i:i + _SQL_BATCH]
+                    placeholders = ",".join("?" * len(part))
+                    found.update(self._conn.execute(
+                        f"SELECT text_hash, row FROM vectors WHERE text_hash IN ({placeholders})", part
+                    ).fetchall())
+
+            results: List[Optional[List[float]]] = [None] * len(texts)
+            if found:
+                matrix = self._rows(max(found.values()), dim)
+                for i, h in enumerate(hashes):
+                    if h in found:
+                        results[i] = matrix[found[h]].tolist()
+
+            hit_count = sum(1 for r in results if r is not None)
+            self._hits += hit_count
+            self._misses += len(texts) - hit_count
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """
+        Persist vectors for texts that are not cached yet.
+
+        The SQLite write transaction doubles as the cross-process write lock:
+        rows are written at the offset recorded in the index, so bytes left by
+        a writer that crashed before committing are simply overwritten.
+
+        Args:
+            texts: Embedded texts
+            vectors: Their embedding vectors
+        """
+        pending: Dict[str, List[float]] = {}
+        for text, vec in zip(texts, vectors):
+            pending.setdefault(hash_text(text), vec)
+        if not pending:
+            return
+
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                keys = list(pending)
+                for i in range(0, len(keys), _SQL_BATCH):
+                    part = keys[i:i + _SQL_BATCH]
+                    placeholders = ",".join("?" * len(part))
+                    for (existing,) in conn.execute(
+                        f"SELECT text_hash FROM vectors WHERE text_hash IN ({placeholders})", part
+                    ):
+                        pending.pop(existing, None)
+                if not pending:
+                    conn.execute("COMMIT")
+                    return
+
+                matrix = np.asarray(list(pending.values()), dtype=np.float32)
+                dim = self._dim()
+                if dim is None:
+                    dim = matrix.shape[1]
+                    conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+                elif dim != matrix.shape[1]:
+                    raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match cached dimension {dim}")
+
+                next_row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vectors").fetchone()[0]
+                fd = os.open(self.vectors_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0))
+                try:
+                    os.lseek(fd, next_row * dim * 4, os.SEEK_SET)
+                    os.write(fd, matrix.tobytes())
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+                conn.executemany(
+                    "INSERT INTO vectors (text_hash, row) VALUES (?, ?)",
+                    [(h, next_row + i) for i, h in enumerate(pending)],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with cache stats
+        """
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            total_requests = self._hits + self._misses
+        hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
+        return {
+            "model": self.model_name,
+            "size": size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(hit_rate, 2),
+            "total_requests": total_requests
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that consults the persistent cache first."""
+
+    def __init__(self, embeddings: Embeddings, model_name: str):
+        """
+        Args:
+            embeddings: Underlying embeddings client (e.g. OpenAIEmbeddings)
+            model_name: Model name used to partition the cache
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not USE_EMBEDDING_CACHE:
+            return self.embeddings.embed_documents(texts)
+
+        cache = get_embedding_cache(self.model_name)
+        try:
+            vectors = cache.get_many(texts)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return self.embeddings.embed_documents(texts)
+
+        # Only send texts that are not cached, each distinct text once
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            new_vectors = self.embeddings.embed_documents(missing)
+            try:
+                cache.put_many(missing, new_vectors)
+            except Exception as e:
+                logger.warning(f"Failed to persist embeddings: {e}")
+            by_text = dict(zip(missing, new_vectors))
+            vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+            logger.info(f"Embedded {len(missing)} new texts ({len(texts) - len(missing)} served from cache)")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str) -> EmbeddingCache:
+    """Get the process-wide cache instance for a model."""
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = EmbeddingCache(model_name)
+        return _caches[model_name]
+
+
+def get_embedding_cache_stats() -> List[Dict[str, Any]]:
+    """Get statistics for every embedding cache opened by this process."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [c.get_stats() for c in caches]
@@ -0,0 +1,70 @@
+"""
+Import-time budget check for the API.
+Measures `import backend.main` in a fresh interpreter and fails when it
+exceeds the budget, listing the slowest modules from `-X importtime`.
+
+Usage:
+    python -m backend.import_budget [--budget SECONDS] [--top N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Seconds `import backend.main` may take before the check fails
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.0"))
+
+_PROBE = (
+    "import time; start = time.perf_counter(); import backend.main; "
+    "print(f'IMPORT_SECONDS={time.perf_counter() - start:.4f}')"
+)
+
+
+def measure_import(probe: str = _PROBE) -> Tuple[float, List[Tuple[float, str]]]:
+    """
+    Import backend.main in a subprocess.
+
+    Returns:
+        Tuple of (wall seconds, [(cumulative seconds, module)] slowest first)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import backend.main failed:\n{proc.stderr[-2000:]}")
+    seconds = float(proc.stdout.strip().rsplit("IMPORT_SECONDS=", 1)[1])
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative) / 1e6, name.rstrip()))
+    modules.sort(reverse=True)
+    return seconds, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check how long `import backend.main` takes.")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SECONDS, help="Budget in seconds")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    args = parser.parse_args()
+
+    seconds, modules = measure_import()
+    print(f"import backend.main: {seconds:.3f}s (budget {args.budget:.3f}s)")
+    for cumulative, name in modules[:args.top]:
+        print(f"  {cumulative:8.3f}s  {name}")
+    if seconds > args.budget:
+        print("FAIL: import time over budget")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+"""
+Background analysis jobs with stage-level progress.
+Jobs are queued in-process and optionally persisted to SQLite so queued or
+interrupted jobs are resumed after a restart.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+from backend.workers import QueueFullError, run_blocking
+from backend.usage import usage_ledger
+
+logger = logging.getLogger(__name__)
+
+# SQLite file for the persistent queue; empty keeps jobs in memory only
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+# Finished jobs kept in memory (persisted jobs remain readable from SQLite)
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "200"))
+JOB_INPUT_DIR = os.path.join("user_memory", "jobs")
+
+# Fields that are internal to the queue and never returned to clients
+_PRIVATE_FIELDS = ("obligations_path", "contract_path")
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class JobStore:
+    """Thread-safe job registry with optional SQLite persistence."""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, retention: int = JOB_RETENTION):
+        """
+        Initialize store.
+
+        Args:
+            db_path: SQLite file, or empty for in-memory only
+            retention: Finished jobs kept in memory
+        """
+        self.retention = retention
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                "created_at TEXT NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+    @property
+    def persistent(self) -> bool:
+        return self._conn is not None
+
+    def _persist(self, job: Dict[str, Any]) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, created_at, payload) VALUES (?, ?, ?, ?)",
+                (job["job_id"], job["status"], job["created_at"], json.dumps(job)),
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist job {job['job_id']}: {e}")
+
+    def _evict_finished(self) -> None:
+        finished = [jid for jid, j in self._jobs.items() if j["status"] in ("completed", "failed")]
+        for jid in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[jid]
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._persist(job)
+            self._evict_finished()
+
+    def update(self, job_id: str, persist: bool = True, **fields) -> None:
+        """
+        Update a job's fields.
+
+        Args:
+            job_id: Job identifier
+            persist: Also write the job to SQLite (False keeps the change in
+                memory, e.g. for per-obligation progress counts)
+        """
+        with self._lock:
+            job = self._load(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["updated_at"] = _now()
+            if persist:
+                self._persist(job)
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None and self._conn is not None:
+            row = self._conn.execute("SELECT payload FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row:
+                job = json.loads(row[0])
+                self._jobs[job_id] = job
+        return job
+
+    def get(self, job_id: str, include_private: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get a snapshot of a job.
+
+        Args:
+            job_id: Job identifier
+            include_private: Include input file paths
+
+        Returns:
+            Copy of the job dict or None if unknown
+        """
+        with self._lock:
+            job = self._load(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        if not include_private:
+            for field in _PRIVATE_FIELDS:
+                job.pop(field, None)
+        return job
+
+    def unfinished_ids(self) -> List[str]:
+        """Persisted jobs that were queued or running when the server stopped."""
+        if self._conn is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+
+class JobQueue:
+    """In-process queue feeding a fixed number of async job workers."""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX):
+        """
+        Initialize queue.
+
+        Args:
+            store: Job store
+            workers: Number of jobs analyzed concurrently
+            max_queued: Maximum jobs waiting to start
+        """
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Event history and live subscribers of jobs that have not finished
+        self._history: Dict[str, List[Dict[str, Any]]] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    async def start(self) -> None:
+        """Start workers and resume unfinished persisted jobs."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        for job_id in self.store.unfinished_ids():
+            self.store.update(job_id, status="queued", stage="queued")
+            self._queue.put_nowait(job_id)
+            logger.info(f"Resumed job {job_id}")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(
+        self,
+        obligations_path: str,
+        obligations_filename: str,
+        contract_path: str,
+        contract_filename: str,
+        contract_url: str,
+        use_batch: bool = True,
+        job_id: str = None
+    ) -> Dict[str, Any]:
+        """
+        Queue an analysis job.
+
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting
+
+        Returns:
+            Public snapshot of the new job
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started")
+        if self._queue.qsize() >= self.max_queued:
+            raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+
+        job_id = job_id or str(uuid.uuid4())
+        now = _now()
+        self.store.create({
+            "job_id": job_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": {"completed": 0, "total": None},
+            "created_at": now,
+            "updated_at": now,
+            "obligations_filename": obligations_filename,
+            "contract_filename": contract_filename,
+            "contract_url": contract_url,
+            "use_batch": use_batch,
+            "obligations_path": obligations_path,
+            "contract_path": contract_path,
+            "result": None,
+            "error": None
+        })
+        self._queue.put_nowait(job_id)
+        return self.store.get(job_id)
+
+    def _publish(self, job_id: str, event: str, data: Dict[str, Any]) -> None:
+        """Deliver an event to subscribers; safe to call from worker threads."""
+        self._loop.call_soon_threadsafe(self._dispatch, job_id, {"event": event, "data": data})
+
+    def _dispatch(self, job_id: str, message: Dict[str, Any]) -> None:
+        self._history.setdefault(job_id, []).append(message)
+        for queue in self._subscribers.get(job_id, []):
+            queue.put_nowait(message)
+        if message["event"] in ("summary", "error"):
+            # Finished jobs are replayed from the store instead
+            self._history.pop(job_id, None)
+            self._subscribers.pop(job_id, None)
+
+    def subscribe(self, job_id: str) -> Optional[asyncio.Queue]:
+        """
+        Subscribe to a job's events.
+
+        Events already emitted are replayed first, so late subscribers see
+        every result. Finished jobs are replayed from the stored result.
+
+        Returns:
+            Queue of {"event", "data"} messages ending with a summary or
+            error event, or None if the job is unknown
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        queue: asyncio.Queue = asyncio.Queue()
+        if job["status"] == "completed":
+            for message in _result_events(job):
+                queue.put_nowait(message)
+        elif job["status"] == "failed":
+            queue.put_nowait({"event": "error", "data": {"job_id": job_id, "message": job["error"]}})
+        else:
+            for message in self._history.get(job_id, []):
+                queue.put_nowait(message)
+            self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(job_id, [])
+        if queue in subscribers:
+            subscribers.remove(queue)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+                self.store.update(job_id, status="failed", stage="failed", error=str(e))
+                self._publish(job_id, "error", {"job_id": job_id, "message": str(e)})
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        from backend.core_enhanced import analyze_contract_enhanced_async
+
+        job = self.store.get(job_id, include_private=True)
+        if job is None:
+            return
+        self.store.update(job_id, status="running", stage="starting")
+        last_stage = "starting"
+
+        def progress(stage: str, completed: int = None, total: int = None) -> None:
+            nonlocal last_stage
+            # Persist stage transitions only; per-obligation counts stay in
+            # memory so a long job does not commit once per obligation
+            self.store.update(
+                job_id, persist=stage != last_stage,
+                stage=stage, progress={"completed": completed, "total": total}
+            )
+            last_stage = stage
+            self._publish(job_id, "progress", {"stage": stage, "completed": completed, "total": total})
+
+        def on_result(index: int, result: Dict[str, Any]) -> None:
+            self._publish(job_id, "result", {"index": index, "result": result})
+
+        resumable = False
+        try:
+            ob_content = await run_blocking(_read_file, job["obligations_path"])
+            contract_content = await run_blocking(_read_file, job["contract_path"])
+            with usage_ledger() as ledger:
+                results, full_text, cache_stats = await analyze_contract_enhanced_async(
+                    ob_content,
+                    job["obligations_filename"],
+                    contract_content,
+                    job["contract_filename"],
+                    job_id,
+                    use_batch=job["use_batch"],
+                    progress=progress,
+                    on_result=on_result
+                )
+        except asyncio.CancelledError:
+            # Shutdown: a persisted job is resumed on the next start and
+            # still needs its inputs
+            resumable = self.store.persistent
+            raise
+        finally:
+            if not resumable:
+                _remove_inputs(job)
+        self.store.update(
+            job_id,
+            status="completed",
+            stage="completed",
+            progress={"completed": len(results), "total": len(results)},
+            result={
+                "results": results,
+                "contract_url": job["contract_url"],
+                "full_text": full_text,
+                "cache_stats": cache_stats,
+                "usage": ledger.summary()
+            }
+        )
+        self._publish(job_id, "summary", _summary(self.store.get(job_id)))
+        logger.info(f"Job {job_id} completed ({len(results)} obligations)")
+
+
+def _summary(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Final event payload: the job result without the per-obligation rows."""
+    result = job["result"]
+    results = result["results"]
+    return {
+        "job_id": job["job_id"],
+        "total": len(results),
+        "compliant": sum(1 for r in results if r.get("is_present") == "Yes"),
+        "non_compliant": sum(1 for r in results if r.get("is_present") == "No"),
+        "contract_url": result["contract_url"],
+        "full_text": result["full_text"],
+        "cache_stats": result["cache_stats"],
+        "usage": result.get("usage")
+    }
+
+
+def _result_events(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Replay a completed job as result events followed by its summary."""
+    events = [
+        {"event": "result", "data": {"index": i, "result": r}}
+        for i, r in enumerate(job["result"]["results"])
+    ]
+    events.append({"event": "summary", "data": _summary(job)})
+    return events
+
+
+def _remove_inputs(job: Dict[str, Any]) -> None:
+    """
+    Delete a finished job's uploaded inputs kept under JOB_INPUT_DIR.
+
+    The contract under uploads/ stays: it backs the job's contract_url.
+    """
+    input_dir = os.path.abspath(JOB_INPUT_DIR)
+    for field in _PRIVATE_FIELDS:
+        path = job.get(field)
+        if not path or os.path.dirname(os.path.abspath(path)) != input_dir:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove job input {path}: {e}")
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# Global queue instance
+_global_queue = JobQueue(JobStore())
+
+
+def get_job_queue() -> JobQueue:
+    """Get global job queue instance."""
+    return _global_queue
@@ -0,0 +1,166 @@
+"""
+Persistent store of generated search keywords per obligation.
+Entries are appended to SQLite one transaction per batch, so concurrent
+requests and worker processes never rewrite or corrupt each other's data.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_STORE_PATH = os.path.join("user_memory", "keyword_cache", "keywords.sqlite")
+# Whole-file JSON cache used by earlier versions; imported once on first open
+LEGACY_KEYWORD_FILE = os.path.join("user_memory", "keyword_cache", "keywords.json")
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+class KeywordStore(MutableMapping):
+    """
+    SQLite-backed mapping of obligation cache key to keyword list.
+
+    Behaves like the dict it replaces (``key in store``, ``store[key]``,
+    ``store[key] = keywords``), with a per-process read-through memo.
+    """
+
+    def __init__(self, path: str = KEYWORD_STORE_PATH, legacy_path: str = LEGACY_KEYWORD_FILE):
+        """
+        Initialize keyword store.
+
+        Args:
+            path: SQLite database file
+            legacy_path: JSON file to migrate entries from, if present
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._memo: Dict[str, List[str]] = {}
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keywords ("
+            "key TEXT PRIMARY KEY, keywords TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        if legacy_path and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+
+    def _migrate(self, legacy_path: str) -> None:
+        """Import the legacy JSON cache and move it aside."""
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+            self.put_many(legacy)
+            os.replace(legacy_path, legacy_path + ".migrated")
+            logger.info(f"Migrated {len(legacy)} keyword entries from {legacy_path}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to migrate keyword cache {legacy_path}: {e}")
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[str]]:
+        """
+        Look up keywords for several cache keys.
+
+        Returns:
+            Dict containing only the keys that were found
+        """
+        found = {k: self._memo[k] for k in keys if k in self._memo}
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing:
+            try:
+                with self._lock:
+                    for i in range(0, len(missing), _SQL_BATCH):
+                        part = missing[i:i + _SQL_BATCH]
+                        placeholders = ",".join("?" * len(part))
+                        rows = self._conn.execute(
+                            f"SELECT key, keywords FROM keywords WHERE key IN ({placeholders})", part
+                        ).fetchall()
+                        for key, keywords in rows:
+                            found[key] = self._memo[key] = json.loads(keywords)
+            except sqlite3.Error as e:
+                logger.warning(f"Keyword store lookup failed: {e}")
+        return found
+
+    def put_many(self, entries: Dict[str, List[str]]) -> None:
+        """
+        Append new entries in one transaction; existing keys are kept.
+
+        Only rows that were actually inserted are memoized; keys that were
+        already stored (e.g. by another worker) are read back from SQLite on
+        their next lookup.
+        """
+        if not entries:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                inserted = []
+                for key, keywords in entries.items():
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO keywords (key, keywords, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(keywords, ensure_ascii=False), now)
+                    )
+                    if cursor.rowcount == 1:
+                        inserted.append(key)
+                self._conn.commit()
+                for key in entries:
+                    self._memo.pop(key, None)
+                for key in inserted:
+                    self._memo[key] = entries[key]
+            logger.info(f"Stored {len(inserted)} new keyword entries")
+        except sqlite3.Error as e:
+            logger.error(f"Failed to store keywords: {e}")
+
+    def clear(self) -> None:
+        """Delete every entry from the database and the in-process memo."""
+        with self._lock:
+            self._conn.execute("DELETE FROM keywords")
+            self._conn.commit()
+            self._memo.clear()
+
+    def __getitem__(self, key: str) -> List[str]:
+        found = self.get_many([key])
+        if key not in found:
+            raise KeyError(key)
+        return found[key]
+
+    def __setitem__(self, key: str, keywords: List[str]) -> None:
+        self.put_many({key: keywords})
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM keywords WHERE key = ?", (key,))
+            self._conn.commit()
+            self._memo.pop(key, None)
+
+    def __contains__(self, key: Any) -> bool:
+        return isinstance(key, str) and key in self.get_many([key])
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM keywords")]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM keywords").fetchone()[0]
+
+
+_global_store: Optional[KeywordStore] = None
+_store_lock = threading.Lock()
+
+
+def get_keyword_store() -> KeywordStore:
+    """Get global keyword store instance."""
+    global _global_store
+    if _global_store is None:
+        with _store_lock:
+            if _global_store is None:
+                _global_store = KeywordStore()
+    return _global_store
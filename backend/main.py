@@ -1,13 +1,18 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import shutil
 import os
+import json
+import asyncio
 import uuid
 import logging
 from typing import List
-from .core import analyze_contract
+from .workers import get_worker_pool, run_blocking, shutdown_cache_io, QueueFullError
+from .jobs import get_job_queue, JOB_INPUT_DIR
+from .models import get_registry, warmup, MODEL_WARMUP
+from .usage import usage_ledger
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -33,17 +38,30 @@ os.makedirs("uploads", exist_ok=True)
 # Mount static files
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+def _write_file(path: str, content: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(content)
+
+def _queue_full_response(e: QueueFullError) -> JSONResponse:
+    logger.warning(f"Rejected analysis: {e}")
+    return JSONResponse(
+        status_code=503,
+        content={"status": "error", "message": str(e)},
+        headers={"Retry-After": "30"}
+    )
+
 @app.get("/")
 async def root():
     return FileResponse("frontend/index.html")
 
 @app.on_event("startup")
 async def startup_cleanup():
-    """Cleanup old vector stores on server startup."""
+    """Cleanup legacy per-session vector stores on server startup."""
     try:
         user_memory_dir = "user_memory"
         if os.path.exists(user_memory_dir):
-            # Remove old FAISS vector stores (keep keyword cache)
+            # Remove old per-session FAISS stores (contract-keyed stores under
+            # user_memory/vector_stores and the keyword cache are kept)
             for item in os.listdir(user_memory_dir):
                 item_path = os.path.join(user_memory_dir, item)
                 if os.path.isdir(item_path) and item.startswith("faiss_"):
@@ -52,10 +70,43 @@ async def startup_cleanup():
                         logger.info(f"Cleaned up old vector store: {item}")
                     except Exception as e:
                         logger.warning(f"Failed to cleanup {item}: {e}")
+            # Remove partial index builds left behind by a crashed worker
+            vector_store_dir = os.path.join(user_memory_dir, "vector_stores")
+            if os.path.isdir(vector_store_dir):
+                for item in os.listdir(vector_store_dir):
+                    if ".tmp-" in item:
+                        shutil.rmtree(os.path.join(vector_store_dir, item), ignore_errors=True)
             logger.info("Startup cleanup completed")
     except Exception as e:
         logger.error(f"Startup cleanup failed: {e}")
 
+@app.on_event("startup")
+async def start_job_queue():
+    """Start background job workers (resuming persisted jobs)."""
+    os.makedirs(JOB_INPUT_DIR, exist_ok=True)
+    await get_job_queue().start()
+
+def _warm_pipeline() -> None:
+    try:
+        # Importing the pipeline pulls in langchain/FAISS/pandas; do it off the request path too
+        from . import core_enhanced  # noqa: F401
+        logger.info(f"Model warmup completed: {warmup()}")
+    except Exception as e:
+        logger.error(f"Model warmup failed: {e}")
+
+@app.on_event("startup")
+async def start_model_warmup():
+    """Load models in the background so the first request does not pay for it."""
+    if MODEL_WARMUP:
+        app.state.warmup_task = asyncio.get_running_loop().run_in_executor(None, _warm_pipeline)
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    """Stop job workers, the analysis worker pool and the cache I/O threads."""
+    await get_job_queue().stop()
+    get_worker_pool().shutdown()
+    shutdown_cache_io()
+
 @app.post("/api/analyze")
 async def analyze(
     obligations_file: UploadFile = File(...),
@@ -65,37 +116,37 @@ async def analyze(
     Main analysis endpoint with enhanced features (caching + batch processing).
     Uses text-embedding-3-small by default for performance.
     """
-    from .core_enhanced import analyze_contract_enhanced
+    from .core_enhanced import analyze_contract_enhanced_async
     
     session_id = str(uuid.uuid4())
     logger.info(f"Starting analysis for session {session_id}")
     
     try:
-        # Ensure uploads directory exists
-        os.makedirs("uploads", exist_ok=True)
-        
-        # Save contract file to disk for preview
-        contract_path = f"uploads/{session_id}_{contract_file.filename}"
-        with open(contract_path, "wb") as f:
+        async with get_worker_pool().admit():
+            # Ensure uploads directory exists
+            os.makedirs("uploads", exist_ok=True)
+            
+            # Save contract file to disk for preview
+            contract_path = f"uploads/{session_id}_{contract_file.filename}"
             contract_content = await contract_file.read()
-            f.write(contract_content)
+            await run_blocking(_write_file, contract_path, contract_content)
+                
+            # Reset cursor for reading content in memory
+            await contract_file.seek(0)
             
-        # Reset cursor for reading content in memory
-        await contract_file.seek(0)
-        
-        # Read files into memory for processing
-        ob_content = await obligations_file.read()
-        # contract_content is already read
-        
-        # Run enhanced analysis (with caching and batch processing)
-        results, full_text, cache_stats = analyze_contract_enhanced(
-            ob_content, 
-            obligations_file.filename, 
-            contract_content, 
-            contract_file.filename, 
-            session_id,
-            use_batch=True  # Enable batch processing by default
-        )
+            # Read files into memory for processing
+            ob_content = await obligations_file.read()
+            # contract_content is already read
+            
+            # Run enhanced analysis (with caching and batch processing)
+            results, full_text, cache_stats = await analyze_contract_enhanced_async(
+                ob_content, 
+                obligations_file.filename, 
+                contract_content, 
+                contract_file.filename, 
+                session_id,
+                use_batch=True  # Enable batch processing by default
+            )
         
         return JSONResponse(content={
             "status": "success", 
@@ -104,6 +155,8 @@ async def analyze(
             "full_text": full_text
         })
         
+    except QueueFullError as e:
+        return _queue_full_response(e)
     except Exception as e:
         logger.error(f"Analysis failed: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -125,36 +178,38 @@ async def analyze_enhanced(
         contract_file: Contract file (PDF/DOCX/TXT/Excel)
         use_batch: Enable batch processing for parallel analysis
     """
-    from .core_enhanced import analyze_contract_enhanced
+    from .core_enhanced import analyze_contract_enhanced_async
     
     session_id = str(uuid.uuid4())
     logger.info(f"Starting enhanced analysis for session {session_id} (batch={use_batch})")
     
     try:
-        # Ensure uploads directory exists
-        os.makedirs("uploads", exist_ok=True)
-        
-        # Save contract file to disk for preview
-        contract_path = f"uploads/{session_id}_{contract_file.filename}"
-        with open(contract_path, "wb") as f:
-            contract_content = await contract_file.read()
-            f.write(contract_content)
+        # Tokens and wall time of every OpenAI/translation call of this request
+        with usage_ledger() as ledger:
+            async with get_worker_pool().admit():
+                # Ensure uploads directory exists
+                os.makedirs("uploads", exist_ok=True)
             
-        # Reset cursor
-        await contract_file.seek(0)
-        
-        # Read files into memory
-        ob_content = await obligations_file.read()
-        
-        # Run enhanced analysis
-        results, full_text, cache_stats = analyze_contract_enhanced(
-            ob_content, 
-            obligations_file.filename, 
-            contract_content, 
-            contract_file.filename, 
-            session_id,
-            use_batch=use_batch
-        )
+                # Save contract file to disk for preview
+                contract_path = f"uploads/{session_id}_{contract_file.filename}"
+                contract_content = await contract_file.read()
+                await run_blocking(_write_file, contract_path, contract_content)
+                
+                # Reset cursor
+                await contract_file.seek(0)
+            
+                # Read files into memory
+                ob_content = await obligations_file.read()
+            
+                # Run enhanced analysis
+                results, full_text, cache_stats = await analyze_contract_enhanced_async(
+                    ob_content, 
+                    obligations_file.filename, 
+                    contract_content, 
+                    contract_file.filename, 
+                    session_id,
+                    use_batch=use_batch
+                )
         
         return JSONResponse(content={
             "status": "success", 
@@ -162,9 +217,12 @@ async def analyze_enhanced(
             "contract_url": f"/uploads/{session_id}_{contract_file.filename}",
             "full_text": full_text,
             "cache_stats": cache_stats,
+            "usage": ledger.summary(),
             "batch_processing_used": use_batch
         })
         
+    except QueueFullError as e:
+        return _queue_full_response(e)
     except Exception as e:
         logger.error(f"Enhanced analysis failed: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -172,28 +230,159 @@ async def analyze_enhanced(
             content={"status": "error", "message": str(e)}
         )
 
+@app.post("/api/jobs")
+async def create_job(
+    obligations_file: UploadFile = File(...),
+    contract_file: UploadFile = File(...),
+    use_batch: bool = True
+):
+    """
+    Queue an analysis and return immediately with a job id.
+    Poll GET /api/jobs/{job_id} for progress and results.
+    """
+    job_id = str(uuid.uuid4())
+    
+    try:
+        os.makedirs("uploads", exist_ok=True)
+        contract_path = f"uploads/{job_id}_{contract_file.filename}"
+        obligations_path = os.path.join(JOB_INPUT_DIR, f"{job_id}_{obligations_file.filename}")
+        await run_blocking(_write_file, contract_path, await contract_file.read())
+        await run_blocking(_write_file, obligations_path, await obligations_file.read())
+        
+        job = get_job_queue().submit(
+            obligations_path,
+            obligations_file.filename,
+            contract_path,
+            contract_file.filename,
+            f"/uploads/{job_id}_{contract_file.filename}",
+            use_batch=use_batch,
+            job_id=job_id
+        )
+        logger.info(f"Queued job {job_id}")
+        
+        return JSONResponse(status_code=202, content={
+            "status": "success",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}",
+            "job": job
+        })
+        
+    except QueueFullError as e:
+        return _queue_full_response(e)
+    except Exception as e:
+        logger.error(f"Failed to queue job: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=500, 
+            content={"status": "error", "message": str(e)}
+        )
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get job status, stage-level progress and (when finished) results."""
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": f"Job {job_id} not found"}
+        )
+    return JSONResponse(content={"status": "success", "job": job})
+
+# Seconds between SSE keep-alive comments while no event is pending
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events stream of a job.
+    
+    Emits "progress" events for stage updates, one "result" event per
+    obligation (same shape as query_rag results) as soon as it completes,
+    and a final "summary" (or "error") event.
+    """
+    job_queue = get_job_queue()
+    queue = job_queue.subscribe(job_id)
+    if queue is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": f"Job {job_id} not found"}
+        )
+    
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+                if message["event"] in ("summary", "error"):
+                    break
+        finally:
+            job_queue.unsubscribe(job_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/cache/stats")
 async def get_cache_stats():
     """Get cache statistics."""
     from .cache import get_cache
+    from .embedding_cache import get_embedding_cache_stats
+    from .translation_memory import get_translation_memory
+    from .singleflight import get_single_flight
+    from .semantic_cache import get_semantic_cache, USE_SEMANTIC_CACHE
+    from .prompts import get_prompt_cache_stats
     
     cache = get_cache()
     stats = cache.get_stats()
     
     return JSONResponse(content={
         "status": "success",
-        "cache_stats": stats
+        "cache_stats": stats,
+        "semantic_cache_stats": get_semantic_cache().get_stats() if USE_SEMANTIC_CACHE else {"enabled": False},
+        "embedding_cache_stats": get_embedding_cache_stats(),
+        "translation_memory_stats": get_translation_memory().get_stats(),
+        "singleflight_stats": get_single_flight().get_stats(),
+        "prompt_cache_stats": get_prompt_cache_stats()
     })
 
 @app.post("/api/cache/clear")
 async def clear_cache():
     """Clear all cached results."""
     from .cache import get_cache
+    from .semantic_cache import get_semantic_cache, USE_SEMANTIC_CACHE
     
     cache = get_cache()
     cache.clear()
+    if USE_SEMANTIC_CACHE:
+        get_semantic_cache().clear()
     
     return JSONResponse(content={
         "status": "success",
         "message": "Cache cleared successfully"
     })
+
+
+@app.get("/api/workers/stats")
+async def get_worker_stats():
+    """Get analysis worker pool, OpenAI rate-limit scheduler and model registry statistics."""
+    from .scheduler import get_scheduler_stats
+    return JSONResponse(content={
+        "status": "success",
+        "worker_stats": get_worker_pool().get_stats(),
+        "scheduler_stats": get_scheduler_stats(),
+        "model_stats": get_registry().get_stats()
+    })
+
+@app.get("/api/usage/stats")
+async def get_usage_stats():
+    """Get OpenAI and translation usage (tokens, wall time) per stage and model since startup."""
+    from .usage import get_usage_stats as usage_stats
+    return JSONResponse(content={
+        "status": "success",
+        "usage_stats": usage_stats()
+    })
@@ -0,0 +1,190 @@
+"""
+Lazy registry of the heavy clients and models used by the pipeline.
+Each one is built on first use (or by warmup()) exactly once per process,
+so importing the backend and starting a worker stays fast.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+SPACY_MODEL = "en_core_web_sm"
+# Load every model in the background when the API starts
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+
+
+def _api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        logger.error("OPENAI_API_KEY not found in environment variables!")
+        raise ValueError("OPENAI_API_KEY must be set in .env file")
+    return api_key
+
+
+def _load_client():
+    from openai import OpenAI
+    # No SDK retries: the rate-limit scheduler owns 429 backoff
+    return OpenAI(api_key=_api_key(), max_retries=0)
+
+
+def _load_async_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=_api_key(), max_retries=0)
+
+
+def _load_embedder():
+    from langchain_openai import OpenAIEmbeddings
+    from backend.embedding_cache import CachedEmbeddings
+    from backend.scheduler import get_scheduler, ScheduledEmbeddings
+    _api_key()
+    return CachedEmbeddings(
+        ScheduledEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME, max_retries=0), get_scheduler(EMBEDDING_MODEL_NAME)),
+        EMBEDDING_MODEL_NAME
+    )
+
+
+def _load_translator():
+    from googletrans import Translator
+    return Translator()
+
+
+def _load_nlp():
+    import spacy
+    try:
+        return spacy.load(SPACY_MODEL)
+    except OSError:
+        # Download if not present (though usually better to do in docker/setup)
+        from spacy.cli import download
+        download(SPACY_MODEL)
+        return spacy.load(SPACY_MODEL)
+
+
+class ModelRegistry:
+    """Builds each registered model once, on first request, thread-safely."""
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]):
+        """
+        Initialize registry.
+
+        Args:
+            loaders: Model name -> zero-argument function that builds it
+        """
+        self._loaders = dict(loaders)
+        self._instances: Dict[str, Any] = {}
+        # One lock per model so a slow load does not block the others
+        self._locks = {name: threading.Lock() for name in self._loaders}
+        self._load_seconds: Dict[str, float] = {}
+
+    def get(self, name: str) -> Any:
+        """
+        Get a model, loading it if this is the first use.
+
+        Args:
+            name: Registered model name
+
+        Returns:
+            The shared model instance
+        """
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._locks[name]:
+                # Double-check locking pattern
+                instance = self._instances.get(name)
+                if instance is None:
+                    start = time.perf_counter()
+                    instance = self._loaders[name]()
+                    self._load_seconds[name] = time.perf_counter() - start
+                    self._instances[name] = instance
+                    logger.info(f"Loaded {name} in {self._load_seconds[name]:.2f}s")
+        return instance
+
+    def set(self, name: str, instance: Any) -> None:
+        """Replace a model (e.g. with a stub in tests)."""
+        with self._locks[name]:
+            self._instances[name] = instance
+
+    def warmup(self, names: Optional[List[str]] = None) -> Dict[str, Optional[float]]:
+        """
+        Load models ahead of the first request.
+
+        Args:
+            names: Models to load (default: all)
+
+        Returns:
+            Model name -> load time in seconds (None if loading failed)
+        """
+        timings = {}
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+                timings[name] = round(self._load_seconds.get(name, 0.0), 3)
+            except Exception as e:
+                logger.warning(f"Warmup of {name} failed: {e}")
+                timings[name] = None
+        return timings
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get registry statistics.
+
+        Returns:
+            Dictionary with loaded models and their load times
+        """
+        return {
+            "registered": list(self._loaders),
+            "loaded": [name for name in self._loaders if name in self._instances],
+            "load_seconds": {name: round(s, 3) for name, s in self._load_seconds.items()}
+        }
+
+
+# Global registry instance
+_global_registry = ModelRegistry({
+    "client": _load_client,
+    "async_client": _load_async_client,
+    "embedder": _load_embedder,
+    "translator": _load_translator,
+    "nlp": _load_nlp,
+})
+
+
+def get_registry() -> ModelRegistry:
+    """Get global model registry instance."""
+    return _global_registry
+
+
+def get_client():
+    """Get the shared OpenAI client."""
+    return _global_registry.get("client")
+
+
+def get_async_client():
+    """Get the shared AsyncOpenAI client."""
+    return _global_registry.get("async_client")
+
+
+def get_embedder():
+    """Get the shared (cached, rate-limited) embedder."""
+    return _global_registry.get("embedder")
+
+
+def get_translator():
+    """Get the shared googletrans translator."""
+    return _global_registry.get("translator")
+
+
+def get_nlp():
+    """Get the shared spaCy pipeline."""
+    return _global_registry.get("nlp")
+
+
+def warmup(names: Optional[List[str]] = None) -> Dict[str, Optional[float]]:
+    """Load models ahead of the first request (see ModelRegistry.warmup)."""
+    return _global_registry.warmup(names)
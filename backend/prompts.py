@@ -0,0 +1,342 @@
+"""
+Versioned prompt templates for obligation analysis.
+Every template puts its invariant instructions first and the variable
+content (obligation, clauses) last, so the long shared prefix is served from
+OpenAI's prompt cache on every call after the first. Cached prompt tokens
+reported by the API are recorded per call.
+"""
+import logging
+import os
+import threading
+from typing import Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+# Structured output: the model fills a JSON schema with a code per validation
+# step and a short reason instead of free-text reasoning followed by fenced JSON
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+
+# Bump whenever a template or the parsing of its answer changes meaningfully
+# (part of the decision cache key)
+TEMPLATE_VERSION = "3"
+PROMPT_VERSION = f"{TEMPLATE_VERSION}-{'structured' if STRUCTURED_OUTPUT else 'cot'}"
+
+# The 7 validation steps shown in the UI: (name, finding when it passes, is_critical)
+VALIDATION_STEPS = [
+    ("Identify Obligation Purpose", "Obligation purpose identified.", False),
+    ("Analyze Clause Effect", "Clause effect analyzed.", False),
+    ("Match Analysis", "Clause matches obligation.", False),
+    ("Material Conflicts Check", "No material conflicts found.", False),
+    ("Termination Check", "No termination options found.", True),
+    ("Discretion Check", "Discretion is acceptable.", True),
+    ("Negative Obligation Check", "Exceptions do not re-impose excluded liability.", True),
+]
+
+# Per-step codes of the structured analysis output
+STEP_CODES = {"P": "PASS", "F": "FAIL", "W": "WARNING", "NA": "N/A"}
+
+# Invariant analysis rules shared by single and packed analysis
+ANALYSIS_RULES = """You are a contract compliance analyst. Analyze whether the contract clause satisfies the obligation.
+
+CRITICAL: Focus on LEGAL EFFECT and COMMERCIAL OUTCOME, not exact wording.
+
+MANDATORY PRE-CHECKS (Check these FIRST before any other analysis):
+
+1. ⚠️ TERMINATION CHECK: 
+   - IF Obligation requires: "continued use", "ensure access", "maintain availability" (PRIMARY GOAL)
+   - AND Clause offers: "reimburse", "refund", "credit" (TERMINATION OPTION)
+   - THEN Result: "No" (Conflict: Termination ≠ Continued Use)
+   - EXCEPTION: If "secure rights" is just a METHOD to remedy infringement, this check does NOT apply.
+
+2. ⚠️ NEGATIVE OBLIGATION CHECK:
+   - IF Obligation says: "does NOT have to", "NOT liable", "no obligation"
+   - AND Clause has: "unless", "except", "provided that" conditions
+   - AND Conditions: RE-IMPOSE the liability the obligation excluded
+   - THEN Result: "No" (Conflict: Exceptions negate the exclusion)
+
+INSTRUCTION: If ANY pre-check fails, stop immediately and return "No". Do not over-analyze.
+
+Analysis Framework:
+1. **Identify the Obligation's Purpose**: What commercial outcome or risk allocation does the obligation seek?
+2. **Analyze the Clause's Effect**: Does the clause achieve the same outcome or provide equivalent protection?
+3. **Apply Materiality Test**: Is there a material difference that significantly changes the business value or risk?
+
+Return "Yes" if:
+- The clause achieves the same commercial/legal outcome as the obligation
+- Any differences are immaterial or standard legal practice
+- Alternative methods to achieve the result are acceptable
+
+Return "No" ONLY if:
+- The clause negates the obligation's core purpose
+- The clause introduces a material escape that significantly shifts risk
+- The clause narrows the obligation in a way that excludes common scenarios
+- The clause adds conditions that re-impose obligations the original sought to exclude
+
+Key Principles:
+
+**Alternative Remedies**: Multiple paths to the same outcome = compliant
+- Example: "modify OR secure licenses" both prevent infringement and ensure continued use → YES
+- Example: "fix OR refund and terminate" have different outcomes (continued use vs. termination) → NO
+- CRITICAL: "Secure licenses", "procure rights", "obtain permissions" mean CONTINUED USE (not termination) → These are acceptable alternatives to modification
+- CRITICAL: "Reimburse", "refund", "credit" are TERMINATION options (customer gets money back and stops using the product)
+- If the obligation requires "continued use", "replace", or "secure rights", and the clause offers "reimburse/refund/credit" as an alternative, this is a material deviation → NO
+- Example: Obligation requires "secure continued use OR replace". Clause offers "secure rights OR substitute OR reimburse". The "reimburse" option allows termination instead of continued use → NO
+
+**Discretion**: Discretion about HOW to achieve a result ≠ discretion about WHETHER to achieve it
+- Example: "Vendor chooses remedy method (fix, license, replace)" = discretion on HOW → YES
+- Example: "Vendor may provide support if deemed reasonable" = discretion on WHETHER → NO
+- CRITICAL: If the clause says "at vendor's sole discretion" but provides multiple remedy options (e.g., "modify OR secure licenses"), the vendor MUST act - they just choose which method → This is discretion on HOW, not WHETHER → YES
+- CRITICAL: Look for the COMMITMENT to achieve the result. If the clause commits to achieving the outcome (e.g., "ensure continued use", "remedy infringement"), the discretion is only about the method
+- Example: "Vendor may, at its sole discretion, implement modifications OR secure licenses to ensure continued use" → Vendor MUST ensure continued use (commitment), discretion is only on method (modify vs. license) → YES
+
+**Standard Exceptions**: Legal/regulatory carve-outs are acceptable for POSITIVE obligations
+- Example: "keep confidential UNLESS required by law" = standard exception → YES
+- Example: "not liable for damages EXCEPT gross negligence" = standard exception → YES
+- Example: "keep confidential UNLESS needed for business purposes" = broad exception → NO
+
+**Negative Obligations (Exclusions)**: If the obligation says vendor is "NOT liable" or "does not have to" do something, analyze carefully:
+- The PURPOSE is to EXCLUDE vendor liability in specific scenarios
+- If the clause adds "unless" or "except" conditions, ask: Do these conditions RE-IMPOSE the liability the obligation sought to exclude?
+- If YES (the exceptions re-impose liability), return "No" - the exceptions negate the exclusion
+- CONCRETE EXAMPLE: 
+  - Obligation: "Vendor does not have to indemnify Bank if infringement is solely from Bank's unauthorized modification."
+  - Clause: "Vendor has no obligation UNLESS: (1) modification was required by license, (2) modification was required by documentation, (3) modification was mutually agreed."
+  - Analysis: These "unless" exceptions RE-IMPOSE indemnification liability for common scenarios (modifications required by docs, etc.), negating the exclusion → "No"
+- The key question: Do the exceptions make the vendor liable again for scenarios the obligation said they should NOT be liable for? If yes → "No"
+
+**Scope**: Broad exceptions that negate "all" or "any" = material conflict
+- Example: "return ALL info EXCEPT for business, legal, disaster recovery" = negates "ALL" → NO
+- Example: "indemnify EXCEPT customer modifications" = standard carve-out → YES"""
+
+# Output format for single-obligation analysis
+SINGLE_OUTPUT_FORMAT = """Return JSON:
+{
+  "is_present": "Yes" or "No",
+  "reason": "Explain the legal effect and whether it matches the obligation's purpose",
+  "suggestion": "If 'No', suggest specific language to achieve compliance. If 'Yes', return null."
+}"""
+
+# Output instructions of the legacy single-obligation mode
+ANALYSIS_INSTRUCTIONS = ANALYSIS_RULES + "\n\n" + SINGLE_OUTPUT_FORMAT
+
+# Validation checklist (Steps 1-7 of the UI)
+COT_CHECKLIST = """Step 1: What is the EXACT purpose of the obligation? (What outcome does it seek?)
+Step 2: What does the clause ACTUALLY say? (Summarize the legal effect)
+Step 3: Do they match? (Does the clause achieve the same outcome?)
+Step 4: Are there any material conflicts? (Does the clause negate or weaken the obligation?)
+Step 5: CRITICAL CHECK - If the obligation requires "continued use", "replace", or "secure rights", does the clause offer "reimburse", "refund", or "credit" as an option? If YES, this is a TERMINATION option that conflicts with continued use → Answer must be "No"
+Step 6: CRITICAL CHECK - If the clause says "at vendor's sole discretion", does it provide multiple remedy options (e.g., "modify OR secure licenses")? If YES, this is discretion on HOW (method), not WHETHER (outcome) → The vendor MUST act, they just choose the method → Answer should be "Yes" if the methods achieve the same outcome
+Step 7: NEGATIVE OBLIGATION CHECK - If the obligation says "does NOT have to" or "NOT liable" or "no obligation", check if the clause has "unless" or "except" conditions. Ask: Do these conditions RE-IMPOSE the liability the obligation sought to EXCLUDE? If YES (the exceptions make vendor liable again for scenarios the obligation excluded) → Answer MUST be "No\""""
+
+# Chain-of-thought instructions of the legacy (free-text) output mode
+COT_INSTRUCTIONS = "IMPORTANT: Before providing your final JSON answer, you MUST think step-by-step:\n\n" + COT_CHECKLIST
+
+ANALYSIS_SYSTEM_PROMPT = "You are a meticulous contract compliance expert. Think step-by-step before answering."
+STRUCTURED_SYSTEM_PROMPT = "You are a meticulous contract compliance expert."
+
+# Structured output: the checklist is answered with one code per step
+STRUCTURED_CHECKLIST = """Work through this checklist and record one code per step in "s1" to "s7":
+P = passes, F = fails (the answer must be "No"), W = partial or weakened match, NA = not applicable.
+
+""" + COT_CHECKLIST
+
+STRUCTURED_FIELDS = """Then give the verdict:
+- "verdict": "Y" if the clause satisfies the obligation, "N" otherwise (any F means "N")
+- "reason": one or two sentences on the legal effect and whether it matches the obligation's purpose
+- "suggestion": if "N", specific language to achieve compliance; if "Y", null"""
+
+STRUCTURED_OUTPUT_FORMAT = STRUCTURED_CHECKLIST + "\n\n" + STRUCTURED_FIELDS
+
+PACKED_STRUCTURED_OUTPUT_FORMAT = """Several obligations are listed below, each with the ids of the clauses retrieved for it. Analyze EACH obligation independently against its own clauses, applying all of the rules above, and return exactly one verdict per obligation, in the order given, with its "obligation_id" (e.g. "O1").
+
+""" + STRUCTURED_OUTPUT_FORMAT
+
+def _verdict_schema(extra_properties=None):
+    """JSON schema of one structured verdict (strict mode: every field required)."""
+    properties = dict(extra_properties or {})
+    for n in range(1, len(VALIDATION_STEPS) + 1):
+        properties[f"s{n}"] = {"type": "string", "enum": list(STEP_CODES)}
+    properties["verdict"] = {"type": "string", "enum": ["Y", "N"]}
+    properties["reason"] = {"type": "string"}
+    properties["suggestion"] = {"type": ["string", "null"]}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "obligation_verdict", "strict": True, "schema": _verdict_schema()}
+}
+
+PACKED_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "packed_verdicts",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "verdicts": {"type": "array", "items": _verdict_schema({"obligation_id": {"type": "string"}})}
+            },
+            "required": ["verdicts"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Output format when several obligations are packed into one call
+PACKED_OUTPUT_FORMAT = """Several obligations are listed below, each with the ids of the clauses retrieved for it. Analyze EACH obligation independently against its own clauses, applying all of the rules above.
+
+Return JSON:
+{
+  "verdicts": [
+    {
+      "obligation_id": "O1",
+      "analysis": "Brief notes on Steps 1-7 for this obligation",
+      "is_present": "Yes" or "No",
+      "reason": "Explain the legal effect and whether it matches the obligation's purpose",
+      "suggestion": "If 'No', suggest specific language to achieve compliance. If 'Yes', return null."
+    }
+  ]
+}
+Return exactly one verdict per obligation, in the order given."""
+
+# Invariant prefixes: everything before the first variable token of a prompt
+if STRUCTURED_OUTPUT:
+    SINGLE_SYSTEM_PROMPT = PACKED_SYSTEM_PROMPT = STRUCTURED_SYSTEM_PROMPT
+    SINGLE_INSTRUCTIONS = ANALYSIS_RULES + "\n\n" + STRUCTURED_OUTPUT_FORMAT
+    PACKED_INSTRUCTIONS = ANALYSIS_RULES + "\n\n" + PACKED_STRUCTURED_OUTPUT_FORMAT
+else:
+    SINGLE_SYSTEM_PROMPT = PACKED_SYSTEM_PROMPT = ANALYSIS_SYSTEM_PROMPT
+    SINGLE_INSTRUCTIONS = (
+        ANALYSIS_INSTRUCTIONS + "\n\n" + COT_INSTRUCTIONS
+        + "\n\nAfter completing these steps, provide your final JSON answer."
+    )
+    PACKED_INSTRUCTIONS = (
+        ANALYSIS_RULES + "\n\n" + PACKED_OUTPUT_FORMAT + "\n\n" + COT_INSTRUCTIONS
+        + "\n\nApply these steps to EACH obligation separately (record them in that verdict's \"analysis\" field), then provide your final JSON answer."
+    )
+
+SINGLE_TEMPLATE = """{instructions}
+
+Obligation:
+{obligation}
+
+Relevant Clauses:
+{clauses}
+"""
+
+PACKED_TEMPLATE = """{instructions}
+
+Clauses:
+{clauses}
+
+Obligations:
+{obligations}
+"""
+
+def build_analysis_messages(obligation: str, docs: List[Any]) -> List[Dict[str, str]]:
+    """Build the chat messages for analysing one obligation against its clauses."""
+    prompt = SINGLE_TEMPLATE.format(
+        instructions=SINGLE_INSTRUCTIONS,
+        obligation=obligation,
+        clauses="\n".join(d.page_content for d in docs)
+    )
+    logger.debug(f"Generated Prompt for '{obligation[:50]}...': {prompt[-500:]}...")
+    return [
+        {"role": "system", "content": SINGLE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_packed_messages(obligations: List[str], contexts: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Build one prompt that analyses several obligations against a
+    deduplicated list of their retrieved clauses.
+
+    Args:
+        obligations: Obligation texts in the group
+        contexts: Matching prepare_rag_context dicts
+    """
+    clause_ids = {}
+    clause_lines = []
+    obligation_lines = []
+    for n, (obligation, context) in enumerate(zip(obligations, contexts), start=1):
+        ids = []
+        for d in context["docs"]:
+            if d.page_content not in clause_ids:
+                clause_ids[d.page_content] = f"C{len(clause_ids) + 1}"
+                clause_lines.append(f"[{clause_ids[d.page_content]}]\n{d.page_content}")
+            ids.append(clause_ids[d.page_content])
+        obligation_lines.append(f"[O{n}] {obligation}\nRelevant clauses: {', '.join(dict.fromkeys(ids))}")
+
+    prompt = PACKED_TEMPLATE.format(
+        instructions=PACKED_INSTRUCTIONS,
+        clauses="\n".join(clause_lines),
+        obligations="\n\n".join(obligation_lines)
+    )
+    return [
+        {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+class PromptCacheStats:
+    """Per-model totals of prompt tokens and the share served from the prompt cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # model -> [calls, calls with cached tokens, prompt tokens, cached tokens]
+        self._totals: Dict[str, List[int]] = {}
+
+    def record(self, model: str, prompt_tokens: int, cached_tokens: int) -> None:
+        with self._lock:
+            totals = self._totals.setdefault(model, [0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += 1 if cached_tokens else 0
+            totals[2] += prompt_tokens
+            totals[3] += cached_tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get prompt cache statistics.
+
+        Returns:
+            Dictionary with per-model call and token counts
+        """
+        with self._lock:
+            totals = {model: list(values) for model, values in self._totals.items()}
+        stats = {}
+        for model, (calls, hits, prompt_tokens, cached_tokens) in totals.items():
+            stats[model] = {
+                "calls": calls,
+                "hits": hits,
+                "hit_rate": round(hits / calls * 100, 2) if calls else 0,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "cached_token_rate": round(cached_tokens / prompt_tokens * 100, 2) if prompt_tokens else 0
+            }
+        return {"prompt_version": PROMPT_VERSION, "models": stats}
+
+
+# Global prompt cache statistics
+_global_prompt_cache_stats = PromptCacheStats()
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """Prompt tokens served from the prompt cache, per a response's usage."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+
+def record_prompt_usage(model: str, usage: Any) -> None:
+    """Record one chat completion's prompt and cached token counts."""
+    if usage is None:
+        return
+    cached_tokens = cached_prompt_tokens(usage)
+    _global_prompt_cache_stats.record(model, usage.prompt_tokens or 0, cached_tokens)
+    logger.debug(f"{model}: {usage.prompt_tokens} prompt tokens, {cached_tokens} cached")
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    """Get global prompt cache statistics."""
+    return _global_prompt_cache_stats.get_stats()
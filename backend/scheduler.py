@@ -0,0 +1,343 @@
+"""
+Rate-limit-aware scheduler shared by all OpenAI chat and embedding calls.
+Admits requests against requests-per-minute and tokens-per-minute budgets,
+follows the x-ratelimit-* response headers, and adapts concurrency with
+AIMD (additive increase on success, multiplicative decrease on 429).
+"""
+import asyncio
+import logging
+import math
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional, Any
+
+from langchain_core.embeddings import Embeddings
+
+from backend.usage import track
+
+logger = logging.getLogger(__name__)
+
+# Default budgets; replaced by the provider's x-ratelimit-limit-* headers
+CHAT_RPM = int(os.getenv("OPENAI_CHAT_RPM", "5000"))
+CHAT_TPM = int(os.getenv("OPENAI_CHAT_TPM", "2000000"))
+EMBEDDING_RPM = int(os.getenv("OPENAI_EMBEDDING_RPM", "5000"))
+EMBEDDING_TPM = int(os.getenv("OPENAI_EMBEDDING_TPM", "5000000"))
+SCHEDULER_MIN_CONCURRENCY = int(os.getenv("SCHEDULER_MIN_CONCURRENCY", "1"))
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "64"))
+SCHEDULER_INITIAL_CONCURRENCY = int(os.getenv("SCHEDULER_INITIAL_CONCURRENCY", "8"))
+# Re-admissions of a call rejected with 429 (each waits out the scheduler's pause)
+RATE_LIMIT_RETRIES = int(os.getenv("SCHEDULER_RATE_LIMIT_RETRIES", "5"))
+
+# Polling interval while waiting for a concurrency slot
+_POLL_SECONDS = 0.05
+# Texts per request sent by OpenAIEmbeddings
+_EMBEDDING_CHUNK_SIZE = 1000
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+_token_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text with tiktoken (chars/4 if unavailable)."""
+    global _token_encoding
+    try:
+        if _token_encoding is None:
+            import tiktoken
+            _token_encoding = tiktoken.get_encoding("o200k_base")
+        return len(_token_encoding.encode(text))
+    except Exception:
+        return len(text) // 4 + 1
+
+
+def estimate_chat_tokens(request: Dict[str, Any]) -> int:
+    """Tokens a chat request counts against TPM: prompt plus max completion."""
+    prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) + 4 for m in request.get("messages", []))
+    return prompt_tokens + int(request.get("max_tokens") or 1000)
+
+
+def is_rate_limit(error: Exception) -> bool:
+    """Whether an OpenAI (or LangChain-wrapped) error is a 429."""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse reset durations such as '1s', '6m0s' or '20ms' into seconds."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(n) * _UNIT_SECONDS[unit] for n, unit in parts)
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        value = headers.get(name)
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class Slot:
+    """An admitted request; call record() with the response headers."""
+
+    def __init__(self, scheduler: "LLMScheduler", tokens: int, queued_seconds: float = 0.0):
+        self.scheduler = scheduler
+        self.tokens = tokens
+        # Time spent waiting for admission
+        self.queued_seconds = queued_seconds
+        self.headers = None
+        self.actual_tokens: Optional[int] = None
+
+    def record(self, headers=None, actual_tokens: Optional[int] = None) -> None:
+        self.headers = headers
+        self.actual_tokens = actual_tokens
+
+
+class LLMScheduler:
+    """Token-bucket admission with AIMD concurrency for one model."""
+
+    def __init__(
+        self,
+        name: str,
+        rpm: int,
+        tpm: int,
+        initial_concurrency: int = SCHEDULER_INITIAL_CONCURRENCY,
+        min_concurrency: int = SCHEDULER_MIN_CONCURRENCY,
+        max_concurrency: int = SCHEDULER_MAX_CONCURRENCY
+    ):
+        """
+        Initialize scheduler.
+
+        Args:
+            name: Model the budgets apply to
+            rpm: Requests per minute
+            tpm: Tokens per minute
+            initial_concurrency: Starting in-flight limit
+            min_concurrency: Floor for multiplicative decrease
+            max_concurrency: Ceiling for additive increase
+        """
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self._in_flight = 0
+        self._request_budget = float(rpm)
+        self._token_budget = float(tpm)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._admitted = 0
+        self._rate_limited = 0
+        self._waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_budget = min(self.rpm, self._request_budget + elapsed * self.rpm / 60.0)
+        self._token_budget = min(self.tpm, self._token_budget + elapsed * self.tpm / 60.0)
+
+    def _try_admit(self, tokens: int, requests: int) -> float:
+        """Admit the request (returns 0) or return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._in_flight >= int(self._limit):
+                return _POLL_SECONDS
+            # A request larger than the whole budget is admitted once it is full
+            need_tokens = min(tokens, self.tpm)
+            need_requests = min(requests, self.rpm)
+            wait = 0.0
+            if self._request_budget < need_requests:
+                wait = max(wait, (need_requests - self._request_budget) * 60.0 / self.rpm)
+            if self._token_budget < need_tokens:
+                wait = max(wait, (need_tokens - self._token_budget) * 60.0 / self.tpm)
+            if wait > 0:
+                return wait
+            self._request_budget -= requests
+            self._token_budget -= tokens
+            self._in_flight += 1
+            self._admitted += 1
+            return 0.0
+
+    def _release(self, slot: Slot, rate_limited: bool) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if slot.actual_tokens is not None:
+                # Refund the difference between the estimate and real usage
+                self._token_budget = min(self.tpm, self._token_budget + slot.tokens - slot.actual_tokens)
+            if slot.headers is not None:
+                self._apply_headers(slot.headers)
+            if rate_limited:
+                self._rate_limited += 1
+                self._limit = max(self.min_concurrency, self._limit / 2)
+                if self._paused_until <= time.monotonic():
+                    # No reset header: back off for one second
+                    self._paused_until = time.monotonic() + 1.0
+                logger.warning(
+                    f"[{self.name}] rate limited; concurrency limit now {int(self._limit)}"
+                )
+            else:
+                self._limit = min(self.max_concurrency, self._limit + 1.0 / self._limit)
+
+    def _apply_headers(self, headers) -> None:
+        """Reconcile budgets with the provider's view (caller holds the lock)."""
+        limit_requests = _header_int(headers, "x-ratelimit-limit-requests")
+        limit_tokens = _header_int(headers, "x-ratelimit-limit-tokens")
+        if limit_requests:
+            self.rpm = limit_requests
+        if limit_tokens:
+            self.tpm = limit_tokens
+
+        now = time.monotonic()
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        if remaining_requests is not None:
+            self._request_budget = min(self._request_budget, remaining_requests)
+            if remaining_requests <= 0:
+                reset = parse_reset(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    self._paused_until = max(self._paused_until, now + reset)
+        if remaining_tokens is not None:
+            self._token_budget = min(self._token_budget, remaining_tokens)
+            if remaining_tokens <= 0:
+                reset = parse_reset(headers.get("x-ratelimit-reset-tokens"))
+                if reset:
+                    self._paused_until = max(self._paused_until, now + reset)
+        retry_after = parse_reset(headers.get("retry-after"))
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+    @contextmanager
+    def slot(self, tokens: int, requests: int = 1):
+        """Block until the request is admitted (for worker threads)."""
+        start = time.monotonic()
+        while True:
+            wait = self._try_admit(tokens, requests)
+            if wait == 0:
+                break
+            with self._lock:
+                self._waited_seconds += wait
+            time.sleep(wait)
+        slot = Slot(self, tokens, time.monotonic() - start)
+        rate_limited = False
+        try:
+            yield slot
+        except Exception as e:
+            rate_limited = is_rate_limit(e)
+            if rate_limited and slot.headers is None:
+                slot.headers = getattr(getattr(e, "response", None), "headers", None)
+            raise
+        finally:
+            self._release(slot, rate_limited)
+
+    @asynccontextmanager
+    async def slot_async(self, tokens: int, requests: int = 1):
+        """Await admission without blocking the event loop."""
+        start = time.monotonic()
+        while True:
+            wait = self._try_admit(tokens, requests)
+            if wait == 0:
+                break
+            with self._lock:
+                self._waited_seconds += wait
+            await asyncio.sleep(wait)
+        slot = Slot(self, tokens, time.monotonic() - start)
+        rate_limited = False
+        try:
+            yield slot
+        except Exception as e:
+            rate_limited = is_rate_limit(e)
+            if rate_limited and slot.headers is None:
+                slot.headers = getattr(getattr(e, "response", None), "headers", None)
+            raise
+        finally:
+            self._release(slot, rate_limited)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get scheduler statistics.
+
+        Returns:
+            Dictionary with budgets, concurrency and throttling stats
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "model": self.name,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "concurrency_limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "request_budget": int(self._request_budget),
+                "token_budget": int(self._token_budget),
+                "admitted": self._admitted,
+                "rate_limited": self._rate_limited,
+                "waited_seconds": round(self._waited_seconds, 2)
+            }
+
+
+class ScheduledEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that admits calls through a scheduler."""
+
+    def __init__(self, embeddings: Embeddings, scheduler: LLMScheduler):
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+
+    def _call(self, tokens: int, requests: int, func, *args):
+        # LangChain does not expose the API usage; the ledger gets the estimate
+        with track("embedding", self.scheduler.name) as call:
+            call.prompt_tokens = tokens
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                try:
+                    # Successful responses' x-ratelimit-* headers are not exposed by
+                    # LangChain; a 429's headers are applied by the slot itself
+                    with self.scheduler.slot(tokens, requests) as slot:
+                        call.queue_seconds += slot.queued_seconds
+                        return func(*args)
+                except Exception as e:
+                    if attempt == RATE_LIMIT_RETRIES or not is_rate_limit(e):
+                        raise
+                    logger.warning(f"[{self.scheduler.name}] embedding call rate limited; retrying after backoff")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(t) for t in texts)
+        requests = max(1, math.ceil(len(texts) / _EMBEDDING_CHUNK_SIZE))
+        return self._call(tokens, requests, self.embeddings.embed_documents, texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(estimate_tokens(text), 1, self.embeddings.embed_query, text)
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(model: str) -> LLMScheduler:
+    """Get the process-wide scheduler for a model (OpenAI limits are per model)."""
+    with _schedulers_lock:
+        if model not in _schedulers:
+            if "embedding" in model:
+                _schedulers[model] = LLMScheduler(model, EMBEDDING_RPM, EMBEDDING_TPM)
+            else:
+                _schedulers[model] = LLMScheduler(model, CHAT_RPM, CHAT_TPM)
+        return _schedulers[model]
+
+
+def get_scheduler_stats() -> List[Dict[str, Any]]:
+    """Get statistics for every scheduler created by this process."""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return [s.get_stats() for s in schedulers]
@@ -0,0 +1,227 @@
+"""
+Semantic near-duplicate cache for obligation decisions.
+Past verdicts are indexed by obligation embedding; a verdict is reused when
+a new obligation and its retrieved clause context are both close enough to
+a previous decision made with the same prompt and model.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+USE_SEMANTIC_CACHE = os.getenv("USE_SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", os.path.join("user_memory", "semantic_cache.sqlite"))
+# Minimum cosine similarity of the obligations and of the clause contexts
+SEMANTIC_OBLIGATION_THRESHOLD = float(os.getenv("SEMANTIC_OBLIGATION_THRESHOLD", "0.92"))
+SEMANTIC_CONTEXT_THRESHOLD = float(os.getenv("SEMANTIC_CONTEXT_THRESHOLD", "0.95"))
+# Nearest obligations checked for a matching context
+SEMANTIC_CANDIDATES = 8
+
+
+class SemanticCache:
+    """ANN index (FAISS inner product) over obligation embeddings of past decisions."""
+
+    def __init__(
+        self,
+        path: str = SEMANTIC_CACHE_PATH,
+        obligation_threshold: float = SEMANTIC_OBLIGATION_THRESHOLD,
+        context_threshold: float = SEMANTIC_CONTEXT_THRESHOLD
+    ):
+        """
+        Initialize semantic cache.
+
+        Args:
+            path: SQLite file holding the decisions and their vectors
+            obligation_threshold: Cosine threshold for the obligation
+            context_threshold: Cosine threshold for the retrieved context
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.obligation_threshold = obligation_threshold
+        self.context_threshold = context_threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_decisions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, version TEXT NOT NULL, obligation TEXT NOT NULL, "
+            "obligation_vector BLOB NOT NULL, context_vector BLOB NOT NULL, verdict TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        # One index per prompt version, so the nearest candidates are
+        # always decisions made with the current prompt and model
+        self._indexes: Dict[str, Any] = {}
+        # Per version and index row: (decision id, obligation, context vector, verdict)
+        self._rows: Dict[str, List[Tuple[int, str, np.ndarray, Dict[str, Any]]]] = {}
+        self._indexed = 0
+        self._last_id = 0
+        self._hits = 0
+        self._misses = 0
+        self._rebuilds = 0
+
+    def _reset_index(self) -> None:
+        self._indexes = {}
+        self._rows = {}
+        self._indexed = 0
+        self._last_id = 0
+
+    def _sync(self) -> None:
+        """
+        Index decisions added since the last sync, including by other workers.
+
+        If indexed rows have disappeared (another worker cleared the cache),
+        the index is rebuilt from the table.
+        """
+        import faiss
+
+        if self._indexed:
+            remaining = self._conn.execute(
+                "SELECT COUNT(*) FROM semantic_decisions WHERE id <= ?", (self._last_id,)
+            ).fetchone()[0]
+            if remaining < self._indexed:
+                logger.info("Semantic cache changed by another worker, rebuilding index")
+                self._reset_index()
+                self._rebuilds += 1
+
+        rows = self._conn.execute(
+            "SELECT id, version, obligation, obligation_vector, context_vector, verdict "
+            "FROM semantic_decisions WHERE id > ? ORDER BY id",
+            (self._last_id,),
+        ).fetchall()
+        if not rows:
+            return
+        obligation_vectors: Dict[str, List[np.ndarray]] = {}
+        for row_id, version, obligation, ob_blob, ctx_blob, verdict in rows:
+            obligation_vectors.setdefault(version, []).append(np.frombuffer(ob_blob, dtype=np.float32))
+            self._rows.setdefault(version, []).append(
+                (row_id, obligation, np.frombuffer(ctx_blob, dtype=np.float32), json.loads(verdict))
+            )
+            self._last_id = row_id
+        self._indexed += len(rows)
+        for version, vectors in obligation_vectors.items():
+            matrix = np.vstack(vectors)
+            if version not in self._indexes:
+                self._indexes[version] = faiss.IndexFlatIP(matrix.shape[1])
+            self._indexes[version].add(matrix)
+
+    def lookup(
+        self, version: str, obligation_vector: np.ndarray, context_vector: np.ndarray
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Find a prior decision for a similar obligation over a similar context.
+
+        Args:
+            version: Prompt version and model of the current analysis
+            obligation_vector: Unit obligation embedding
+            context_vector: Unit mean embedding of the retrieved clauses
+
+        Returns:
+            Tuple of (verdict dict, audit dict) or None
+        """
+        query = np.asarray(obligation_vector, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            self._sync()
+            best = None
+            index = self._indexes.get(version)
+            if index is not None and index.ntotal:
+                rows = self._rows[version]
+                scores, indices = index.search(query, min(SEMANTIC_CANDIDATES, index.ntotal))
+                for score, idx in zip(scores[0], indices[0]):
+                    if idx == -1 or score < self.obligation_threshold:
+                        continue
+                    row_id, obligation, ctx_vec, verdict = rows[idx]
+                    ctx_score = float(np.dot(ctx_vec, context_vector))
+                    if ctx_score >= self.context_threshold and (best is None or score + ctx_score > best[0]):
+                        best = (float(score) + ctx_score, row_id, obligation, float(score), ctx_score, verdict)
+            if best is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        _, row_id, obligation, ob_score, ctx_score, verdict = best
+        return verdict, {
+            "matched_decision_id": row_id,
+            "matched_obligation": obligation,
+            "obligation_similarity": round(ob_score, 4),
+            "context_similarity": round(ctx_score, 4)
+        }
+
+    def add(
+        self,
+        version: str,
+        obligation: str,
+        obligation_vector: np.ndarray,
+        context_vector: np.ndarray,
+        verdict: Dict[str, Any]
+    ) -> None:
+        """Record a decision made by the LLM."""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO semantic_decisions (version, obligation, obligation_vector, context_vector, verdict, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        version,
+                        obligation,
+                        np.asarray(obligation_vector, dtype=np.float32).tobytes(),
+                        np.asarray(context_vector, dtype=np.float32).tobytes(),
+                        json.dumps(verdict),
+                        time.time(),
+                    ),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store semantic cache entry: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM semantic_decisions")
+            self._conn.commit()
+            self._reset_index()
+            self._hits = 0
+            self._misses = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get semantic cache statistics.
+
+        Returns:
+            Dictionary with size, thresholds and hit stats
+        """
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM semantic_decisions").fetchone()[0]
+            total_requests = self._hits + self._misses
+        hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
+        return {
+            "enabled": USE_SEMANTIC_CACHE,
+            "size": size,
+            "obligation_threshold": self.obligation_threshold,
+            "context_threshold": self.context_threshold,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(hit_rate, 2),
+            "total_requests": total_requests,
+            "indexed_versions": len(self._indexes),
+            "rebuilds": self._rebuilds
+        }
+
+
+_global_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get global semantic cache instance."""
+    global _global_semantic_cache
+    if _global_semantic_cache is None:
+        with _semantic_cache_lock:
+            if _global_semantic_cache is None:
+                _global_semantic_cache = SemanticCache()
+    return _global_semantic_cache
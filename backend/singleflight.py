@@ -0,0 +1,110 @@
+"""
+Single-flight execution of identical analysis requests.
+Callers that ask for the same key while a computation is in flight wait for
+that computation instead of starting their own, whether they run on the
+event loop or in worker threads.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._executions = 0
+        self._shared = 0
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """Return the in-flight future for key and whether the caller leads."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._shared += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self._executions += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func once per key across concurrent callers (blocking).
+
+        Args:
+            key: Identity of the computation
+            func: Callable producing the result
+
+        Returns:
+            Result of the single execution; an exception raised by it is
+            re-raised in every waiting caller
+        """
+        future, leader = self._join(key)
+        if not leader:
+            logger.info(f"Joined in-flight analysis {key[:12]}")
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Await func once per key across concurrent callers.
+
+        Callers waiting on a computation led by another event loop or a
+        worker thread are woken thread-safely.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            logger.info(f"Joined in-flight analysis {key[:12]}")
+            # Shield so a cancelled waiter does not cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get single-flight statistics.
+
+        Returns:
+            Dictionary with execution and sharing counts
+        """
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self._executions,
+                "shared": self._shared
+            }
+
+
+# Global instance shared by the sync and async pipelines
+_global_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """Get global single-flight instance."""
+    return _global_flight
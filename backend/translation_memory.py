@@ -0,0 +1,168 @@
+"""
+Persistent translation memory for contract and obligation text.
+Translations are keyed by (source language, normalized text hash, backend)
+in SQLite so repeated boilerplate is never sent to a translator twice.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_MEMORY_PATH = os.getenv(
+    "TRANSLATION_MEMORY_PATH", os.path.join("user_memory", "translation_memory.sqlite")
+)
+USE_TRANSLATION_MEMORY = os.getenv("USE_TRANSLATION_MEMORY", "true").lower() == "true"
+
+# Preferred backend when the same text was translated by more than one
+BACKEND_PREFERENCE = ("openai", "googletrans")
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 400
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so layout differences do not cause misses."""
+    return " ".join(text.split())
+
+
+def hash_source(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """SQLite-backed store of previously translated text."""
+
+    def __init__(self, path: str = TRANSLATION_MEMORY_PATH):
+        """
+        Initialize translation memory.
+
+        Args:
+            path: SQLite database file
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "src_lang TEXT NOT NULL, text_hash TEXT NOT NULL, backend TEXT NOT NULL, "
+            "translation TEXT NOT NULL, PRIMARY KEY (src_lang, text_hash, backend))"
+        )
+        self._conn.commit()
+        self._hits = 0
+        self._misses = 0
+
+    def get_many(self, src_lang: str, texts: List[str]) -> List[Optional[str]]:
+        """
+        Look up translations from any backend.
+
+        Args:
+            src_lang: Source language code
+            texts: Source texts
+
+        Returns:
+            One translation (or None on a miss) per input text
+        """
+        if not USE_TRANSLATION_MEMORY:
+            return [None] * len(texts)
+        hashes = [hash_source(t) for t in texts]
+        found: Dict[str, Dict[str, str]] = {}
+        try:
+            with self._lock:
+                unique = list(set(hashes))
+                for i in range(0, len(unique), _SQL_BATCH):
+                    part = unique[i:i + _SQL_BATCH]
+                    placeholders = ",".join("?" * len(part))
+                    rows = self._conn.execute(
+                        "SELECT text_hash, backend, translation FROM translations "
+                        f"WHERE src_lang = ? AND text_hash IN ({placeholders})",
+                        [src_lang, *part],
+                    ).fetchall()
+                    for text_hash, backend, translation in rows:
+                        found.setdefault(text_hash, {})[backend] = translation
+        except sqlite3.Error as e:
+            logger.warning(f"Translation memory lookup failed: {e}")
+
+        results: List[Optional[str]] = []
+        for h in hashes:
+            by_backend = found.get(h)
+            if not by_backend:
+                results.append(None)
+                continue
+            backend = next((b for b in BACKEND_PREFERENCE if b in by_backend), next(iter(by_backend)))
+            results.append(by_backend[backend])
+
+        with self._lock:
+            hit_count = sum(1 for r in results if r is not None)
+            self._hits += hit_count
+            self._misses += len(texts) - hit_count
+        return results
+
+    def get(self, src_lang: str, text: str) -> Optional[str]:
+        return self.get_many(src_lang, [text])[0]
+
+    def put_many(self, src_lang: str, backend: str, texts: List[str], translations: List[str]) -> None:
+        """
+        Store translations produced by a backend.
+
+        Args:
+            src_lang: Source language code
+            backend: Translator that produced them ("googletrans" or "openai")
+            texts: Source texts
+            translations: Translated texts, aligned with texts
+        """
+        if not USE_TRANSLATION_MEMORY:
+            return
+        rows = [(src_lang, hash_source(t), backend, tr) for t, tr in zip(texts, translations)]
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO translations (src_lang, text_hash, backend, translation) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store translations: {e}")
+
+    def put(self, src_lang: str, backend: str, text: str, translation: str) -> None:
+        self.put_many(src_lang, backend, [text], [translation])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get translation memory statistics.
+
+        Returns:
+            Dictionary with hit/miss stats
+        """
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            total_requests = self._hits + self._misses
+        hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
+        return {
+            "enabled": USE_TRANSLATION_MEMORY,
+            "size": size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(hit_rate, 2),
+            "total_requests": total_requests
+        }
+
+
+_global_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_translation_memory() -> TranslationMemory:
+    """Get global translation memory instance."""
+    global _global_memory
+    if _global_memory is None:
+        with _memory_lock:
+            if _global_memory is None:
+                _global_memory = TranslationMemory()
+    return _global_memory
@@ -0,0 +1,182 @@
+"""
+Usage ledger for OpenAI and translation calls.
+Every chat, embedding and translation call reports its tokens, service time
+and rate-limit queue time to the ledger of the request it runs for (carried
+in a context variable) and to a process-wide aggregate, broken down by
+pipeline stage and model. Request ledgers also break analysis calls down by
+obligation.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = ("calls", "errors", "prompt_tokens", "completion_tokens", "cached_tokens", "seconds", "queue_seconds")
+_TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+
+class UsageCall:
+    """Token counts of one call, filled in by the caller while it is tracked."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        # Time spent waiting for rate-limit admission (excluded from seconds)
+        self.queue_seconds = 0.0
+
+    def set_usage(self, usage: Any) -> None:
+        """Copy counts from an OpenAI response's usage object (may be None)."""
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+
+
+class UsageLedger:
+    """Token and wall-time totals per (stage, model), and per obligation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._keys: Dict[str, Dict[str, float]] = {}
+        self._started = time.monotonic()
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        call: UsageCall,
+        seconds: float,
+        error: bool = False,
+        keys: Optional[Sequence[str]] = None
+    ) -> None:
+        """
+        Add one call.
+
+        Args:
+            seconds: Service time, excluding the rate-limit queue
+            keys: Obligations the call answered; a call answering several
+                (packed analysis) is split evenly between them
+        """
+        with self._lock:
+            entry = self._entries.setdefault((stage, model), dict.fromkeys(_FIELDS, 0))
+            self._add(entry, call, seconds, error, 1.0)
+            for key in keys or ():
+                self._add(self._keys.setdefault(key, dict.fromkeys(_FIELDS, 0)), call, seconds, error, 1.0 / len(keys))
+
+    @staticmethod
+    def _add(entry: Dict[str, float], call: UsageCall, seconds: float, error: bool, share: float) -> None:
+        entry["calls"] += 1
+        entry["errors"] += 1 if error else 0
+        for field in _TOKEN_FIELDS:
+            entry[field] += getattr(call, field) * share
+        entry["seconds"] += seconds * share
+        entry["queue_seconds"] += call.queue_seconds * share
+
+    @staticmethod
+    def _rounded(entry: Dict[str, float]) -> Dict[str, float]:
+        for field in _TOKEN_FIELDS:
+            entry[field] = int(round(entry[field]))
+        entry["seconds"] = round(entry["seconds"], 3)
+        entry["queue_seconds"] = round(entry["queue_seconds"], 3)
+        return entry
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the ledger.
+
+        Returns:
+            Dictionary with overall totals, one row per (stage, model), one
+            row per obligation (when calls were keyed) and the wall time since
+            the ledger was opened. Call seconds overlap when calls run
+            concurrently; queue_seconds is time spent waiting for rate-limit
+            admission and is not part of seconds.
+        """
+        with self._lock:
+            entries = {key: dict(entry) for key, entry in self._entries.items()}
+            keys = {key: dict(entry) for key, entry in self._keys.items()}
+        totals = dict.fromkeys(_FIELDS, 0)
+        stages = []
+        for (stage, model), entry in sorted(entries.items()):
+            for field in _FIELDS:
+                totals[field] += entry[field]
+            stages.append({"stage": stage, "model": model, **self._rounded(entry)})
+        summary = {
+            "totals": self._rounded(totals),
+            "stages": stages,
+            "wall_seconds": round(time.monotonic() - self._started, 3)
+        }
+        if keys:
+            summary["obligations"] = [
+                {"obligation": key, **self._rounded(entry)} for key, entry in keys.items()
+            ]
+        return summary
+
+
+# Ledger of the request being served, if any
+_current_ledger: contextvars.ContextVar[Optional[UsageLedger]] = contextvars.ContextVar("usage_ledger", default=None)
+
+# Process-wide aggregate over all calls, and number of ledgers closed
+_global_ledger = UsageLedger()
+_requests = 0
+_requests_lock = threading.Lock()
+
+
+@contextmanager
+def usage_ledger() -> Iterator[UsageLedger]:
+    """
+    Open a ledger for the calls made inside the block (one per request).
+
+    Worker threads see the ledger when the context is copied into them
+    (run_blocking, or executor.submit(contextvars.copy_context().run, ...)).
+    """
+    global _requests
+    ledger = UsageLedger()
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+        with _requests_lock:
+            _requests += 1
+
+
+@contextmanager
+def track(stage: str, model: str, keys: Optional[List[str]] = None) -> Iterator[UsageCall]:
+    """
+    Time one call and record it (with the counts set on the yielded
+    UsageCall) in the current ledger and the global aggregate.
+
+    Args:
+        stage: Pipeline stage, e.g. "analysis", "keywords", "translation"
+        model: Model or backend that served the call
+        keys: Obligations the call answered (request ledger only)
+    """
+    call = UsageCall()
+    start = time.perf_counter()
+    error = False
+    try:
+        yield call
+    except BaseException:
+        error = True
+        raise
+    finally:
+        seconds = max(0.0, time.perf_counter() - start - call.queue_seconds)
+        ledger = _current_ledger.get()
+        if ledger is not None:
+            ledger.record(stage, model, call, seconds, error, keys)
+        _global_ledger.record(stage, model, call, seconds, error)
+
+
+def get_usage_stats() -> Dict[str, Any]:
+    """Get process-wide usage statistics."""
+    with _requests_lock:
+        requests = _requests
+    return {"requests": requests, **_global_ledger.summary()}
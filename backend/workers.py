@@ -0,0 +1,126 @@
+"""
+Bounded worker pool for blocking analysis stages.
+Keeps PDF extraction, translation, FAISS and embedding work off the FastAPI
+event loop, and caps how many analyses the server accepts at once.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Threads running blocking analysis stages
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+# Analyses admitted at once (running or waiting); further requests are rejected
+ANALYSIS_QUEUE_DEPTH = int(os.getenv("ANALYSIS_QUEUE_DEPTH", "16"))
+# Threads for short cache lookups and writes, kept apart from the analysis
+# pool so they never queue behind minute-long ingestion stages
+CACHE_IO_WORKERS = int(os.getenv("CACHE_IO_WORKERS", "4"))
+
+
+class QueueFullError(Exception):
+    """Raised when the analysis queue is at capacity."""
+
+
+class AnalysisWorkerPool:
+    """Thread pool with admission control for contract analyses."""
+
+    def __init__(self, max_workers: int = ANALYSIS_WORKERS, queue_depth: int = ANALYSIS_QUEUE_DEPTH):
+        """
+        Initialize pool.
+
+        Args:
+            max_workers: Number of worker threads
+            queue_depth: Maximum number of admitted analyses
+        """
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._rejected = 0
+        self._completed = 0
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Reserve a slot for one analysis for the duration of the block.
+
+        Raises:
+            QueueFullError: If queue_depth analyses are already admitted
+        """
+        with self._lock:
+            if self._admitted >= self.queue_depth:
+                self._rejected += 1
+                raise QueueFullError(
+                    f"Analysis queue is full ({self.queue_depth} analyses in progress)"
+                )
+            self._admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._admitted -= 1
+                self._completed += 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        # Carry context variables into the worker thread like asyncio.to_thread
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, func, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool statistics.
+
+        Returns:
+            Dictionary with pool stats
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "completed": self._completed
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+# Global pool instance
+_global_pool = AnalysisWorkerPool()
+
+
+def get_worker_pool() -> AnalysisWorkerPool:
+    """Get global worker pool instance."""
+    return _global_pool
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking analysis stage on the global worker pool."""
+    return await _global_pool.run(func, *args, **kwargs)
+
+
+_cache_io_executor = ThreadPoolExecutor(max_workers=CACHE_IO_WORKERS, thread_name_prefix="cache-io")
+
+
+async def run_cache_io(func: Callable, *args, **kwargs) -> Any:
+    """Run a short blocking cache read or write on the dedicated cache I/O threads."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_cache_io_executor, call)
+
+
+def shutdown_cache_io() -> None:
+    _cache_io_executor.shutdown(wait=False)
@@ -1,9 +1,22 @@
 import axios from "axios";
-import { useState } from "react";
+import { useRef, useState } from "react";
 import { AnalysisResults } from "../components/AnalysisResults";
 import { FileUpload } from "../components/FileUpload";
 import { ProgressBar } from "../components/reusable/ProgressBar";
 
+const API_BASE = "http://localhost:8000";
+
+// Progress shown when each pipeline stage starts; "analyzing" fills the rest
+const STAGE_PROGRESS: Record<string, number> = {
+  queued: 2,
+  starting: 3,
+  extracting: 5,
+  translating: 15,
+  embedding: 30,
+  keywords: 40,
+  analyzing: 40,
+};
+
 export const Home = () => {
   const [excelFile, setExcelFile] = useState<File | null>(null);
   const [pdfFile, setPdfFile] = useState<File | null>(null);
@@ -11,6 +24,12 @@ export const Home = () => {
   const [progress, setProgress] = useState(0);
   const [showResults, setShowResults] = useState(false);
   const [analysisData, setAnalysisData] = useState<any>(null);
+  const eventSourceRef = useRef<EventSource | null>(null);
+
+  const closeStream = () => {
+    eventSourceRef.current?.close();
+    eventSourceRef.current = null;
+  };
 
   const handleAnalyze = async () => {
     if (!excelFile || !pdfFile) {
@@ -18,14 +37,11 @@ export const Home = () => {
       return;
     }
 
+    closeStream();
     setIsAnalyzing(true);
     setProgress(0);
     setShowResults(false);
-
-    // Start simulated progress
-    const interval = setInterval(() => {
-      setProgress((p) => (p < 90 ? p + 5 : p)); // stop at 90%
-    }, 300);
+    setAnalysisData(null);
 
     try {
       const formData = new FormData();
@@ -33,27 +49,76 @@ export const Home = () => {
       formData.append("contract_file", pdfFile);
       formData.append("use_batch", "true");
 
-      const res = await axios.post("http://localhost:8000/api/analyze/enhanced", formData, {
+      const res = await axios.post(`${API_BASE}/api/jobs`, formData, {
         headers: {
           "Content-Type": "multipart/form-data",
         },
       });
-      console.log(res.data);
-      setAnalysisData(res.data);
+      const { job_id, job } = res.data;
 
-      clearInterval(interval);
-      setProgress(100);
-      setIsAnalyzing(false);
-      setShowResults(true);
+      // Rows are kept by index so they render in obligation-file order
+      const rows: any[] = [];
+      const events = new EventSource(`${API_BASE}/api/jobs/${job_id}/events`);
+      eventSourceRef.current = events;
+
+      events.addEventListener("progress", (e) => {
+        const { stage, completed, total } = JSON.parse((e as MessageEvent).data);
+        const base = STAGE_PROGRESS[stage] ?? 0;
+        const value =
+          stage === "analyzing" && total ? base + Math.round((60 * completed) / total) : base;
+        setProgress((p) => Math.min(99, Math.max(p, value)));
+      });
+
+      events.addEventListener("result", (e) => {
+        const { index, result } = JSON.parse((e as MessageEvent).data);
+        rows[index] = result;
+        setAnalysisData({
+          status: "success",
+          results: rows.filter(Boolean),
+          contract_url: job.contract_url,
+          full_text: "",
+        });
+        // Show rows as soon as the first obligation is done
+        setIsAnalyzing(false);
+        setShowResults(true);
+      });
+
+      events.addEventListener("summary", (e) => {
+        const summary = JSON.parse((e as MessageEvent).data);
+        console.log(summary);
+        setAnalysisData({
+          status: "success",
+          results: rows.filter(Boolean),
+          contract_url: summary.contract_url,
+          full_text: summary.full_text,
+          cache_stats: summary.cache_stats,
+        });
+        closeStream();
+        setProgress(100);
+        setIsAnalyzing(false);
+        setShowResults(true);
+      });
+
+      // Server-sent "error" events carry data; connection errors do not and
+      // are retried by EventSource (the server replays missed events)
+      events.addEventListener("error", (e) => {
+        const data = (e as MessageEvent).data;
+        if (!data && events.readyState !== EventSource.CLOSED) return;
+        console.log(data ? JSON.parse(data) : e);
+        closeStream();
+        setIsAnalyzing(false);
+        alert("Analysis failed. Please try again.");
+      });
     } catch (err) {
       console.log(err);
-      clearInterval(interval);
+      closeStream();
       setIsAnalyzing(false);
       alert("Analysis failed. Please try again.");
     }
   };
 
   const handleReset = () => {
+    closeStream();
     setExcelFile(null);
     setPdfFile(null);
     setIsAnalyzing(false);
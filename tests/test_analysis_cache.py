@@ -0,0 +1,103 @@
+"""
+Unit tests for the two-tier analysis cache (no API key needed).
+Run with: python -m pytest tests/test_analysis_cache.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.cache import AnalysisCache, DiskCache
+
+
+def _result(n, size=10):
+    return {"is_present": "Yes", "reason": "x" * size, "n": n}
+
+
+def test_l1_lru_eviction_respects_byte_budget():
+    entry_bytes = len(json.dumps(_result(0)))
+    cache = AnalysisCache(max_bytes=entry_bytes * 2, ttl=0, disk_path="")
+    cache.set("a", "h", _result(1))
+    cache.set("b", "h", _result(2))
+    assert cache.get("a", "h") == _result(1)  # "a" is now most recently used
+    cache.set("c", "h", _result(3))
+
+    assert cache.get("b", "h") is None
+    assert cache.get("a", "h") == _result(1)
+    assert cache.get("c", "h") == _result(3)
+    stats = cache.get_stats()["l1"]
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= entry_bytes * 2
+
+
+def test_oversized_result_is_not_kept_in_memory():
+    cache = AnalysisCache(max_bytes=50, ttl=0, disk_path="")
+    cache.set("a", "h", _result(1, size=100))
+    assert cache.get("a", "h") is None
+
+
+def test_l1_entry_expires():
+    cache = AnalysisCache(ttl=0.05, disk_path="")
+    cache.set("a", "h", _result(1))
+    time.sleep(0.1)
+    assert cache.get("a", "h") is None
+    assert cache.get_stats()["l1"]["expirations"] == 1
+
+
+def test_expired_entry_is_not_served_from_disk(tmp_path):
+    cache = AnalysisCache(ttl=0.1, disk_path=str(tmp_path / "cache.sqlite"))
+    cache.set("a", "h", _result(1))
+    time.sleep(0.2)
+    assert cache.get("a", "h") is None
+    assert cache.get_stats()["l2"]["hits"] == 0
+    assert cache.get_stats()["l2"]["size"] == 0
+
+
+def test_disk_hit_is_promoted_with_remaining_lifetime(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    AnalysisCache(ttl=0.3, disk_path=path).set("a", "h", _result(1))
+    time.sleep(0.2)
+
+    # A new worker finds the row on disk with ~0.1s left, not a fresh 10s
+    other = AnalysisCache(ttl=10, disk_path=path)
+    assert other.get("a", "h") == _result(1)
+    time.sleep(0.15)
+    assert other.get("a", "h") is None
+
+
+def test_per_entry_ttl_reaches_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    AnalysisCache(ttl=10, disk_path=path).set("a", "h", _result(1), ttl=0.05)
+    time.sleep(0.1)
+    assert AnalysisCache(ttl=10, disk_path=path).get("a", "h") is None
+
+
+def test_disk_tier_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    AnalysisCache(ttl=0, disk_path=path).set("a", "h", _result(1), version="v1")
+    other = AnalysisCache(ttl=0, disk_path=path)
+    assert other.get("a", "h", "v1") == _result(1)
+    assert other.get("a", "h", "v2") is None
+
+
+def test_disk_get_reports_no_expiry_as_zero(tmp_path):
+    disk = DiskCache(str(tmp_path / "cache.sqlite"))
+    disk.set("k", _result(1))
+    assert disk.get("k") == (_result(1), 0.0)
+
+
+def test_disk_tier_prunes_oldest_rows_over_byte_cap(tmp_path, monkeypatch):
+    import backend.cache as cache_module
+    monkeypatch.setattr(cache_module, "_PRUNE_EVERY", 5)
+    disk = DiskCache(str(tmp_path / "cache.sqlite"), max_bytes=400)
+    for n in range(20):
+        # Incompressible-ish payloads so each row has a real size
+        disk.set(f"k{n}", {"n": n, "reason": os.urandom(40).hex()})
+        time.sleep(0.001)
+    stats = disk.get_stats()
+    assert stats["bytes"] <= 400
+    assert stats["pruned"] > 0
+    assert disk.get("k0") is None
+    assert disk.get("k19") is not None
@@ -0,0 +1,80 @@
+"""
+Unit tests for chunk line mapping (no API key needed).
+Run with: python -m pytest tests/test_chunk_text.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("langchain.text_splitter")
+pytest.importorskip("fitz")
+
+from backend.core import chunk_text
+
+
+def _records(pages=2, lines=80, translated=False):
+    records = []
+    for page in range(1, pages + 1):
+        for n in range(lines):
+            # Sparse line numbers, as extracted PDFs skip blank lines
+            line = 3 * n + 1
+            text = f"Page {page} line {line:03d}: the supplier shall deliver the goods on time."
+            rec = {"page": page, "line": line, "text": text}
+            if translated:
+                rec["text_original"] = f"Seite {page} Zeile {line:03d}: Lieferung."
+                rec["text_translated"] = text
+            records.append(rec)
+    return records
+
+
+def _line_of(records, page, text):
+    return next(r["line"] for r in records if r["page"] == page and r["text"] == text)
+
+
+def test_chunks_span_several_and_overlap():
+    docs = chunk_text(_records())
+    assert len(docs) > 4
+    assert {d.metadata["page"] for d in docs} == {1, 2}
+
+
+def test_line_start_and_end_match_first_and_last_line():
+    records = _records()
+    for doc in chunk_text(records):
+        lines = doc.page_content.split("\n")
+        page = doc.metadata["page"]
+        assert doc.metadata["line_start"] == _line_of(records, page, lines[0])
+        assert doc.metadata["line_end"] == _line_of(records, page, lines[-1])
+        assert doc.metadata["line"] == doc.metadata["line_start"]
+
+
+def test_untranslated_chunk_keeps_text_as_original():
+    for doc in chunk_text(_records()):
+        assert doc.metadata["text_original"] == doc.page_content
+
+
+def test_translated_chunk_maps_to_original_lines():
+    records = _records(translated=True)
+    originals = {(r["page"], r["line"]): r["text_original"] for r in records}
+    for doc in chunk_text(records):
+        page = doc.metadata["page"]
+        expected = [
+            originals[(page, line)]
+            for line in range(doc.metadata["line_start"], doc.metadata["line_end"] + 1, 3)
+        ]
+        assert doc.metadata["text_original"] == "\n".join(expected)
+
+
+def test_repeated_lines_map_to_their_own_positions():
+    text = "The supplier shall deliver the goods on time."
+    records = [{"page": 1, "line": n, "text": text} for n in range(1, 201)]
+    docs = chunk_text(records)
+    starts = [d.metadata["line_start"] for d in docs]
+    assert starts == sorted(set(starts))
+    assert starts[0] == 1
+    assert docs[-1].metadata["line_end"] == 200
+    for doc in docs:
+        span = doc.metadata["line_end"] - doc.metadata["line_start"] + 1
+        assert span == doc.page_content.count("\n") + 1
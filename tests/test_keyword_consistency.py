@@ -8,7 +8,7 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.core import generate_dynamic_keywords, _keyword_cache, KEYWORD_CACHE_FILE
+from backend.core import generate_dynamic_keywords, _keyword_cache
 
 def test_keyword_consistency():
     """Test that keywords are consistent across multiple runs."""
@@ -25,9 +25,8 @@ def test_keyword_consistency():
     print()
     
     # Clear cache to start fresh
-    if os.path.exists(KEYWORD_CACHE_FILE):
-        os.remove(KEYWORD_CACHE_FILE)
-        print("✓ Cleared existing keyword cache")
+    _keyword_cache.clear()
+    print("✓ Cleared existing keyword cache")
     
     # First run - should generate keywords
     print("\n--- RUN 1: Generating keywords (should call LLM) ---")
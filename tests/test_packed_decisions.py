@@ -0,0 +1,75 @@
+"""
+Unit tests for packed obligation analysis helpers (no API key needed).
+Run with: python -m pytest tests/test_packed_decisions.py
+"""
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("langchain.text_splitter")
+pytest.importorskip("fitz")
+
+from backend.core import group_obligations_by_clauses, parse_packed_response
+
+
+def _context(*clauses):
+    return {"docs": [SimpleNamespace(page_content=c) for c in clauses]}
+
+
+def test_overlapping_obligations_share_a_group():
+    contexts = {
+        0: _context("a", "b", "c"),
+        1: _context("a", "b", "d"),
+        2: _context("x", "y"),
+    }
+    assert group_obligations_by_clauses(contexts, max_size=4, min_overlap=0.5) == [[0, 1], [2]]
+
+
+def test_low_overlap_starts_a_new_group():
+    contexts = {0: _context("a", "b", "c", "d"), 1: _context("a", "x", "y", "z")}
+    assert group_obligations_by_clauses(contexts, max_size=4, min_overlap=0.5) == [[0], [1]]
+
+
+def test_group_size_is_capped():
+    contexts = {i: _context("a", "b") for i in range(5)}
+    assert group_obligations_by_clauses(contexts, max_size=2, min_overlap=0.5) == [[0, 1], [2, 3], [4]]
+
+
+def test_obligation_joins_group_with_largest_overlap():
+    contexts = {
+        0: _context("a", "b"),
+        1: _context("c", "d"),
+        2: _context("a", "c", "d"),
+    }
+    assert group_obligations_by_clauses(contexts, max_size=4, min_overlap=0.5) == [[0], [1, 2]]
+
+
+def test_parse_packed_response_maps_ids_to_positions():
+    answer = json.dumps({"verdicts": [
+        {"obligation_id": "O2", "is_present": "Yes", "reason": "Clause 4 covers it."},
+        {"obligation_id": "1", "is_present": "No", "reason": "Not found.", "suggestion": "Add it."},
+    ]})
+    first, second = parse_packed_response(2, answer)
+    assert first[:3] == ("No", "Not found.", "Add it.")
+    assert second[:3] == ("Yes", "Clause 4 covers it.", None)
+
+
+def test_parse_packed_response_leaves_missing_and_invalid_ids_empty():
+    answer = json.dumps({"verdicts": [
+        {"obligation_id": "O7", "is_present": "Yes", "reason": "out of range"},
+        {"obligation_id": "O2", "reason": "no verdict"},
+        {"obligation_id": "O3", "verdict": "Y", "reason": "ok"},
+    ]})
+    verdicts = parse_packed_response(3, answer)
+    assert verdicts[0] is None
+    assert verdicts[1] is None
+    assert verdicts[2][0] == "Yes"
+
+
+def test_parse_packed_response_survives_unreadable_answer():
+    assert parse_packed_response(2, "not json") == [None, None]
@@ -0,0 +1,130 @@
+"""
+Unit tests for the rate-limit scheduler (no API key needed).
+Run with: python -m pytest tests/test_scheduler.py
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("langchain_core")
+
+from backend.scheduler import LLMScheduler, ScheduledEmbeddings, parse_reset
+
+
+class RateLimitError(Exception):
+    """Stand-in for openai.RateLimitError."""
+
+    status_code = 429
+
+    def __init__(self, headers=None):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("1s", 1.0),
+    ("20ms", 0.02),
+    ("6m0s", 360.0),
+    ("1h2m3.5s", 3723.5),
+    ("2.5", 2.5),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_reset(value, seconds):
+    if seconds is None:
+        assert parse_reset(value) is None
+    else:
+        assert parse_reset(value) == pytest.approx(seconds)
+
+
+def _scheduler(**kwargs):
+    return LLMScheduler("test", rpm=10000, tpm=10_000_000, **kwargs)
+
+
+def test_success_increases_limit_additively():
+    scheduler = _scheduler(initial_concurrency=4, max_concurrency=64)
+    for _ in range(4):
+        with scheduler.slot(10):
+            pass
+    # Each success adds 1/limit, so four successes at ~4 add about one slot
+    assert 4.9 < scheduler._limit < 5.0
+
+
+def test_limit_stays_within_bounds():
+    scheduler = _scheduler(initial_concurrency=2, min_concurrency=1, max_concurrency=2)
+    for _ in range(10):
+        with scheduler.slot(10):
+            pass
+    assert scheduler._limit == 2
+
+
+def test_rate_limit_halves_limit_and_pauses():
+    scheduler = _scheduler(initial_concurrency=8, min_concurrency=1)
+    with pytest.raises(RateLimitError):
+        with scheduler.slot(10):
+            raise RateLimitError()
+    stats = scheduler.get_stats()
+    assert stats["concurrency_limit"] == 4
+    assert stats["rate_limited"] == 1
+    # Without a reset header admission is paused for a second
+    assert scheduler._try_admit(10, 1) > 0.5
+
+
+def test_rate_limit_never_drops_below_min_concurrency():
+    scheduler = _scheduler(initial_concurrency=2, min_concurrency=2)
+    with pytest.raises(RateLimitError):
+        with scheduler.slot(10):
+            raise RateLimitError()
+    assert scheduler.get_stats()["concurrency_limit"] == 2
+
+
+def test_reset_header_of_a_429_sets_the_pause():
+    scheduler = _scheduler()
+    headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "5s"}
+    with pytest.raises(RateLimitError):
+        with scheduler.slot(10):
+            raise RateLimitError(headers)
+    assert 4.5 < scheduler._try_admit(10, 1) <= 5.0
+
+
+def test_headers_replace_budgets_and_refund_tokens():
+    scheduler = _scheduler()
+    with scheduler.slot(1000) as slot:
+        slot.record({"x-ratelimit-limit-requests": "500", "x-ratelimit-limit-tokens": "200000"}, actual_tokens=100)
+    assert scheduler.rpm == 500
+    assert scheduler.tpm == 200000
+
+
+def test_admission_waits_for_token_budget():
+    scheduler = LLMScheduler("test", rpm=10000, tpm=6000)
+    with scheduler.slot(6000):
+        pass
+    # The bucket is empty and refills at 100 tokens per second
+    wait = scheduler._try_admit(100, 1)
+    assert 0.5 < wait <= 1.0
+    time.sleep(wait)
+    assert scheduler._try_admit(100, 1) == 0
+
+
+def test_embeddings_are_readmitted_after_a_429():
+    scheduler = _scheduler(initial_concurrency=4)
+    headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "20ms"}
+    attempts = []
+
+    class FlakyEmbeddings:
+        def embed_query(self, text):
+            attempts.append(text)
+            if len(attempts) == 1:
+                raise RateLimitError(headers)
+            return [1.0, 0.0]
+
+    embeddings = ScheduledEmbeddings(FlakyEmbeddings(), scheduler)
+    assert embeddings.embed_query("clause") == [1.0, 0.0]
+    assert len(attempts) == 2
+    assert scheduler.get_stats()["rate_limited"] == 1
+    assert scheduler.get_stats()["concurrency_limit"] == 2
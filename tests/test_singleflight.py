@@ -0,0 +1,101 @@
+"""
+Unit tests for single-flight execution (no API key needed).
+Run with: python -m pytest tests/test_singleflight.py
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"verdict": "Yes"}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(flight.do, "key", compute) for _ in range(4)]
+        while flight.get_stats()["shared"] < 3:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == {"verdict": "Yes"} for r in results)
+    assert flight.get_stats() == {"in_flight": 0, "executions": 1, "shared": 3}
+
+
+def test_error_reaches_every_waiter_and_key_is_released():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(flight.do, "key", fail) for _ in range(2)]
+        while flight.get_stats()["shared"] < 1:
+            time.sleep(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+    # A later call runs again instead of reusing the failure
+    assert flight.do("key", lambda: 42) == 42
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.get_stats()["executions"] == 2
+
+
+def test_async_callers_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "Yes"
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", compute) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["Yes", "Yes", "Yes"]
+    assert len(calls) == 1
+
+
+def test_async_caller_joins_thread_leader():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def compute():
+        started.set()
+        time.sleep(0.1)
+        return "Yes"
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        leader = loop.run_in_executor(None, flight.do, "key", compute)
+        await loop.run_in_executor(None, started.wait, 5)
+        return await asyncio.gather(leader, flight.do_async("key", compute))
+
+    assert asyncio.run(main()) == ["Yes", "Yes"]
+    assert flight.get_stats()["executions"] == 1